@@ -1,166 +1,504 @@
 #! /usr/bin/env python
 # encoding: utf-8
 
-import time
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+import argparse
+import csv
+import io
+import json
 import os
+import platform
+import random
 import sys
-import argparse
+import time
+
 import pykodo as kodo
 
+# A high resolution clock where available (Python 3.3 and later)
+timer = getattr(time, 'perf_counter', time.time)
 
-def run_coding_test(algorithm, field, symbols, symbol_size):
-    """Run a timed encoding and decoding benchmark."""
-    # First, we measure the combined setup time for the encoder and decoder
-    start = time.clock()
-    encoder_factory = kodo.encoder_factory(
-        algorithm=algorithm,
-        field=field,
-        max_symbols=symbols,
-        max_symbol_size=symbol_size)
+# The timed phases of a trial
+PHASES = ['setup', 'encode', 'decode', 'recode']
 
-    decoder_factory = kodo.decoder_factory(
-        algorithm=algorithm,
-        field=field,
-        max_symbols=symbols,
-        max_symbol_size=symbol_size)
+# The statistics of the decoding overhead in each trial
+OVERHEAD_METRICS = ['sent', 'received', 'overhead', 'non_innovative',
+                    'ratio']
 
-    encoder = encoder_factory.build()
-    decoder = decoder_factory.build()
+# The percentiles reported for each phase and metric
+PERCENTILES = [10, 90]
 
-    # Stop the setup timer
-    stop = time.clock()
-    # Calculate interval in microseconds
-    setup_time = 1e6 * (stop - start)
+# The columns describing a configuration in the CSV output
+CONFIGURATION = ['algorithm', 'field', 'decoder', 'symbols', 'symbol_size',
+                 'trials', 'failures']
 
-    # We measure pure coding, so we always turn off the systematic mode
-    if 'set_systematic_off' in dir(encoder):
-        encoder.set_systematic_off()
+# The number of payloads encoded for each symbol, an ample number even for
+# the binary field
+PAYLOADS_PER_SYMBOL = 2
 
-    # Create random data to encode
-    data_in = os.urandom(encoder.block_size())
-
-    # The generated payloads will be stored in this list
-    payloads = []
+# The number of received payloads per symbol after which a trial of the
+# decoding overhead fails
+MAX_PAYLOADS_PER_SYMBOL = 10
 
-    # Generate an ample number of coded symbols (considering kodo_binary)
-    payload_count = 2 * symbols
+# Encoders without a decoder of their own produce payloads for this decoder
+FALLBACK_DECODER = kodo.full_vector if hasattr(kodo, 'full_vector') else None
 
-    # Start the encoding timer
-    start = time.clock()
 
-    # Copy the input data to the encoder
-    encoder.set_const_symbols(data_in)
+def find_stacks():
+    """
+    Return the stacks which can be benchmarked.
 
-    # Generate coded symbols with the encoder
-    for i in range(payload_count):
-        payload = encoder.write_payload()
-        payloads.append(payload)
+    :returns: A list of (algorithm, field, decoder algorithm) tuples.
+    """
+    decoders = set(kodo.stacks('decoder'))
 
-    # Stop the encoding timer
-    stop = time.clock()
-    # Calculate interval in microseconds
-    encoding_time = 1e6 * (stop - start)
+    result = []
+    for algorithm, field in kodo.stacks('encoder'):
+        if (algorithm, field) in decoders:
+            result.append((algorithm, field, algorithm))
+        elif (FALLBACK_DECODER, field) in decoders:
+            result.append((algorithm, field, FALLBACK_DECODER))
+    return result
 
-    # Calculate the encoding rate in megabytes / seconds
-    encoded_bytes = payload_count * symbol_size
-    encoding_rate = encoded_bytes / encoding_time
 
-    # Start the decoding timer
-    start = time.clock()
+def build_factory(factory, algorithm, field, symbols, symbol_size):
+    """Create a factory, leaving out the field for stacks without one."""
+    kwargs = dict(
+        algorithm=algorithm,
+        max_symbols=symbols,
+        max_symbol_size=symbol_size)
+    if field is not None:
+        kwargs['field'] = field
+    return factory(**kwargs)
+
+
+def percentile(values, percent):
+    """
+    Return a percentile of the values, interpolating between the closest
+    ranks.
+
+    :param values: The values, which must not be empty.
+    :param percent: The percentile between 0 and 100.
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (
+        position - lower)
+
+
+def summarize(values):
+    """Return the median, mean, percentiles and extremes of the values."""
+    summary = {
+        'median': percentile(values, 50),
+        'mean': float(sum(values)) / len(values),
+        'min': min(values),
+        'max': max(values)}
+    for percent in PERCENTILES:
+        summary['p{}'.format(percent)] = percentile(values, percent)
+    return summary
+
+
+def run_trial(algorithm, field, decoder_algorithm, symbols, symbol_size):
+    """
+    Run a single encoding, decoding and recoding trial.
+
+    :returns: A tuple with a dict of the timing of each phase in
+              microseconds and whether the data was decoded correctly. The
+              recode timing is None if the decoder does not recode.
+    """
+    timings = {}
+
+    # The setup phase creates the factories and builds the coders
+    start = timer()
+    encoder_factory = build_factory(
+        kodo.encoder_factory, algorithm, field, symbols, symbol_size)
+    decoder_factory = build_factory(
+        kodo.decoder_factory, decoder_algorithm, field, symbols, symbol_size)
+    encoder = encoder_factory.build()
+    decoder = decoder_factory.build()
+    timings['setup'] = 1e6 * (timer() - start)
 
-    # Feed the coded symbols to the decoder
-    for i in range(payload_count):
-        if decoder.is_complete():
-            break
-        decoder.read_payload(payloads[i])
+    # We measure pure coding, so we always turn off the systematic mode
+    if hasattr(encoder, 'set_systematic_off'):
+        encoder.set_systematic_off()
 
-    # Copy the symbols from the decoder
-    data_out = decoder.copy_from_symbols()
+    data_in = os.urandom(encoder.block_size())
 
-    # Stop the decoding timer
-    stop = time.clock()
-    # Calculate interval in microseconds
-    decoding_time = 1e6 * (stop - start)
+    payload_count = PAYLOADS_PER_SYMBOL * symbols
 
-    # Calculate the decoding rate in megabytes / seconds
-    decoded_bytes = symbols * symbol_size
-    decoding_rate = decoded_bytes / decoding_time
+    start = timer()
+    encoder.set_const_symbols(data_in)
+    payloads, lengths = encoder.write_payloads(payload_count)
+    timings['encode'] = 1e6 * (timer() - start)
 
-    if data_out == data_in:
-        success = True
-    else:
-        success = False
+    # The decoder works in place on the payload buffer, so the recoder gets
+    # its own copy
+    recoder_payloads = bytes(payloads)
 
-    print("Setup time: {} microsec".format(setup_time))
-    print("Encoding time: {} microsec".format(encoding_time))
-    print("Decoding time: {} microsec".format(decoding_time))
+    start = timer()
+    decoder.read_payloads(payloads, lengths, inplace=True)
+    data_out = decoder.copy_from_symbols()
+    timings['decode'] = 1e6 * (timer() - start)
+
+    timings['recode'] = None
+    recoder = decoder_factory.build()
+    if hasattr(recoder, 'write_payload_into'):
+        recoder.read_payloads(recoder_payloads, lengths)
+        buffer = bytearray(recoder.payload_size())
+
+        start = timer()
+        for i in range(payload_count):
+            recoder.write_payload_into(buffer)
+        timings['recode'] = 1e6 * (timer() - start)
+
+    return timings, decoder.is_complete() and data_out == data_in
+
+
+def run_benchmark(algorithm, field, decoder_algorithm, symbols, symbol_size,
+                  trials, warmup):
+    """
+    Benchmark a configuration with a number of trials.
+
+    :param algorithm: The algorithm of the encoder.
+    :param field: The finite field, or None for stacks without one.
+    :param decoder_algorithm: The algorithm of the decoder.
+    :param symbols: The number of symbols.
+    :param symbol_size: The size of each symbol in bytes.
+    :param trials: The number of timed trials.
+    :param warmup: The number of untimed trials run before the timed ones.
+    :returns: A dict with the configuration and the timing summaries.
+    """
+    for i in range(warmup):
+        run_trial(algorithm, field, decoder_algorithm, symbols, symbol_size)
+
+    timings = dict((phase, []) for phase in PHASES)
+    failures = 0
+    for i in range(trials):
+        trial, success = run_trial(
+            algorithm, field, decoder_algorithm, symbols, symbol_size)
+        failures += not success
+        for phase in PHASES:
+            if trial[phase] is not None:
+                timings[phase].append(trial[phase])
+
+    result = {
+        'algorithm': algorithm,
+        'field': field,
+        'decoder': decoder_algorithm,
+        'symbols': symbols,
+        'symbol_size': symbol_size,
+        'trials': trials,
+        'failures': failures}
+
+    for phase in PHASES:
+        result[phase] = summarize(timings[phase]) if timings[phase] else None
+
+    # The rates in megabytes per second are based on the median timings
+    block_size = symbols * symbol_size
+    result['encode_rate'] = \
+        PAYLOADS_PER_SYMBOL * block_size / result['encode']['median']
+    result['decode_rate'] = block_size / result['decode']['median']
+    return result
+
+
+def run_overhead_trial(algorithm, field, decoder_algorithm, symbols,
+                       symbol_size, loss, systematic, rng):
+    """
+    Run a single decoding overhead trial over a lossy channel.
+
+    Payloads are sent until the decoder is complete, each one lost with the
+    given probability, and a received payload is non-innovative if it does
+    not increase the rank of the decoder.
+
+    :returns: A tuple with a dict of the overhead metrics and whether the
+              decoder completed.
+    """
+    encoder = build_factory(
+        kodo.encoder_factory, algorithm, field, symbols,
+        symbol_size).build()
+    decoder = build_factory(
+        kodo.decoder_factory, decoder_algorithm, field, symbols,
+        symbol_size).build()
+
+    if not systematic and hasattr(encoder, 'set_systematic_off'):
+        encoder.set_systematic_off()
 
-    return (success, encoding_rate, decoding_rate)
+    encoder.set_const_symbols(os.urandom(encoder.block_size()))
+
+    # Give up on decoders which cannot complete, e.g. with a broken stack
+    limit = MAX_PAYLOADS_PER_SYMBOL * symbols
+
+    payload = bytearray(encoder.payload_size())
+    view = memoryview(payload)
+    sent = 0
+    received = 0
+    non_innovative = 0
+    while not decoder.is_complete() and received < limit:
+        length = encoder.write_payload_into(payload)
+        sent += 1
+        if rng.random() < loss:
+            continue
+
+        received += 1
+        rank = decoder.rank()
+        decoder.read_payload(view[:length])
+        if decoder.rank() == rank:
+            non_innovative += 1
+
+    metrics = {
+        'sent': sent,
+        'received': received,
+        'overhead': received - symbols,
+        'non_innovative': non_innovative,
+        'ratio': float(received) / max(decoder.rank(), 1)}
+    return metrics, decoder.is_complete()
+
+
+def run_overhead(algorithm, field, decoder_algorithm, symbols, symbol_size,
+                 trials, loss, systematic, seed):
+    """
+    Measure the distribution of the decoding overhead of a configuration.
+
+    :param algorithm: The algorithm of the encoder.
+    :param field: The finite field, or None for stacks without one.
+    :param decoder_algorithm: The algorithm of the decoder.
+    :param symbols: The number of symbols.
+    :param symbol_size: The size of each symbol in bytes.
+    :param trials: The number of trials.
+    :param loss: The probability that a payload is lost.
+    :param systematic: Send the symbols uncoded first if the encoder
+                       supports it.
+    :param seed: The seed of the losses, so that every configuration sees
+                 the same losses. None for a random seed.
+    :returns: A dict with the configuration and the metric summaries.
+    """
+    rng = random.Random(seed)
+
+    values = dict((metric, []) for metric in OVERHEAD_METRICS)
+    failures = 0
+    for i in range(trials):
+        trial, success = run_overhead_trial(
+            algorithm, field, decoder_algorithm, symbols, symbol_size, loss,
+            systematic, rng)
+        failures += not success
+        for metric in OVERHEAD_METRICS:
+            values[metric].append(trial[metric])
+
+    result = {
+        'algorithm': algorithm,
+        'field': field,
+        'decoder': decoder_algorithm,
+        'symbols': symbols,
+        'symbol_size': symbol_size,
+        'trials': trials,
+        'failures': failures,
+        'loss': loss,
+        'systematic': systematic,
+        'seed': seed}
+
+    for metric in OVERHEAD_METRICS:
+        result[metric] = summarize(values[metric])
+    return result
+
+
+def write_json(results, output):
+    """Write the results with a description of the platform as JSON."""
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results}
+    json.dump(report, output, indent=2, sort_keys=True)
+    output.write('\n')
+
+
+def write_csv(results, output, scalars, metrics):
+    """
+    Write the results as CSV with one row per configuration.
+
+    :param results: The results.
+    :param output: The file to write to.
+    :param scalars: The names of the values written as they are.
+    :param metrics: The names of the summaries written as one column per
+                    statistic.
+    """
+    statistics = ['median', 'mean', 'min', 'max'] + [
+        'p{}'.format(percent) for percent in PERCENTILES]
+    columns = CONFIGURATION + scalars
+    for metric in metrics:
+        columns += ['{}_{}'.format(metric, name) for name in statistics]
+
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    for result in results:
+        row = dict(result)
+        for metric in metrics:
+            for name in statistics:
+                summary = result[metric]
+                row['{}_{}'.format(metric, name)] = \
+                    summary[name] if summary else None
+        writer.writerow(
+            ['' if row[column] is None else row[column]
+             for column in columns])
 
 
 def main():
-    parser = argparse.ArgumentParser(description=run_coding_test.__doc__)
+    """
+    Benchmark the encoding, decoding and recoding throughput.
+
+    Every combination of the given algorithms, fields, symbols and symbol
+    sizes is run a number of times, and the median and percentiles of the
+    setup, encoding, decoding and recoding times are written as JSON or CSV.
+    In the overhead mode, the number of payloads needed to decode over a
+    lossy channel is measured instead.
+    """
+    stacks = find_stacks()
+    algorithms = sorted(set(stack[0] for stack in stacks))
+    fields = sorted(set(stack[1] for stack in stacks if stack[1]))
 
-    # Disable the algorithms that do not work with the benchmark code
-    algorithms = list(kodo.algorithms)
-    algorithms.remove(kodo.no_code)
-    algorithms.remove(kodo.sparse_full_vector)
+    parser = argparse.ArgumentParser(description=main.__doc__)
 
     parser.add_argument(
-        '--algorithm',
+        '--algorithms',
         type=str,
-        help='The algorithm to use',
+        nargs='+',
+        help='The algorithms to benchmark, all by default',
         choices=algorithms,
-        default=kodo.full_vector)
+        default=algorithms)
 
     parser.add_argument(
-        '--field',
+        '--fields',
         type=str,
-        help='The finite field to use',
-        choices=kodo.fields,
-        default=kodo.binary8)
+        nargs='+',
+        help='The finite fields to benchmark, all by default',
+        choices=fields,
+        default=fields)
 
     parser.add_argument(
         '--symbols',
         type=int,
-        help='The number of symbols',
-        default=16)
+        nargs='+',
+        help='The numbers of symbols',
+        default=[16, 64])
 
     parser.add_argument(
-        '--symbol_size',
+        '--symbol-sizes',
         type=int,
-        help='The size of each symbol',
-        default=1600)
+        nargs='+',
+        help='The sizes of each symbol',
+        default=[1600])
 
     parser.add_argument(
-        '--dry-run',
+        '--mode',
+        type=str,
+        help='Measure the coding throughput or the decoding overhead',
+        choices=['throughput', 'overhead'],
+        default='throughput')
+
+    parser.add_argument(
+        '--loss',
+        type=float,
+        help='The probability that a payload is lost in the overhead mode',
+        default=0.0)
+
+    parser.add_argument(
+        '--systematic',
         action='store_true',
-        help='Run without the actual benchmark.')
+        help='Keep the systematic mode of the encoders in the overhead mode')
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help='The seed of the losses in the overhead mode')
 
-    if args.dry_run:
-        sys.exit(0)
+    parser.add_argument(
+        '--trials',
+        type=int,
+        help='The number of timed trials of each configuration',
+        default=10)
 
-    print("Algorithm: {} / Finite field: {}".format(
-        args.algorithm, args.field))
+    parser.add_argument(
+        '--warmup',
+        type=int,
+        help='The number of untimed trials of each configuration',
+        default=2)
 
-    print("Symbols: {} / Symbol size: {}".format(
-        args.symbols, args.symbol_size))
+    parser.add_argument(
+        '--format',
+        type=str,
+        help='The output format',
+        choices=['json', 'csv'],
+        default='json')
 
-    decoding_success, encoding_rate, decoding_rate = run_coding_test(
-        args.algorithm,
-        args.field,
-        args.symbols,
-        args.symbol_size)
+    parser.add_argument(
+        '--output',
+        type=str,
+        help='The output file, the standard output by default')
 
-    print("Encoding rate: {} MB/s".format(encoding_rate))
-    print("Decoding rate: {} MB/s".format(decoding_rate))
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Run a single small configuration without output.')
 
-    if decoding_success:
-        print("Data decoded correctly.")
+    args = parser.parse_args()
+
+    if args.trials < 1:
+        parser.error("at least one trial is required")
+    if not 0 <= args.loss < 1:
+        parser.error("the loss must be at least 0 and less than 1")
+
+    configurations = [
+        (algorithm, field, decoder, symbols, symbol_size)
+        for algorithm, field, decoder in stacks
+        if algorithm in args.algorithms and
+        (field is None or field in args.fields)
+        for symbols in args.symbols
+        for symbol_size in args.symbol_sizes]
+
+    if args.dry_run:
+        configurations = [configuration[:3] + (4, 16)
+                          for configuration in configurations[:1]]
+        args.trials = 1
+        args.warmup = 0
+
+    results = []
+    for configuration in configurations:
+        # The progress is reported on stderr to keep the output clean
+        sys.stderr.write("{} {} {} {}\n".format(
+            configuration[0], configuration[1] or '-', *configuration[3:]))
+        if args.mode == 'throughput':
+            results.append(
+                run_benchmark(*configuration, trials=args.trials,
+                              warmup=args.warmup))
+        else:
+            results.append(
+                run_overhead(*configuration, trials=args.trials,
+                             loss=args.loss, systematic=args.systematic,
+                             seed=args.seed))
+
+    if args.format == 'json':
+        write = write_json
+    elif args.mode == 'throughput':
+        def write(results, output):
+            write_csv(results, output, ['encode_rate', 'decode_rate'],
+                      PHASES)
+    else:
+        def write(results, output):
+            write_csv(results, output, ['loss', 'systematic', 'seed'],
+                      OVERHEAD_METRICS)
+
+    if args.dry_run:
+        write(results, io.StringIO() if sys.version_info[0] >= 3
+              else io.BytesIO())
+    elif args.output:
+        with open(args.output, 'w') as output:
+            write(results, output)
     else:
-        print("Decoding failed.")
+        write(results, sys.stdout)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+import os
+import random
+import sys
+
+import kodo
+import kodo_object
+
+
+def main():
+    """
+    Object encoding example.
+
+    This example shows how to encode and decode an object which is larger
+    than a single generation. The object is split into generations, and each
+    payload carries the index of its generation so the decoder can pass it
+    to the right decoder.
+    """
+    # Set the number of symbols in each generation and the size of a symbol
+    # in bytes
+    symbols = 16
+    symbol_size = 160
+
+    encoder_factory = kodo.FullVectorEncoderFactoryBinary8(
+        max_symbols=symbols,
+        max_symbol_size=symbol_size)
+
+    decoder_factory = kodo.FullVectorDecoderFactoryBinary8(
+        max_symbols=symbols,
+        max_symbol_size=symbol_size)
+
+    # Create an object spanning a few generations. The size is deliberately
+    # not a multiple of the generation size.
+    data_in = os.urandom(10 * symbols * symbol_size + 1000)
+
+    encoder = kodo_object.ObjectEncoder(encoder_factory, data_in)
+    decoder = kodo_object.ObjectDecoder(decoder_factory, len(data_in))
+
+    print("Object of {} bytes split into {} generations".format(
+        len(data_in), encoder.generations()))
+
+    # Send the generations one at a time, until each one is decoded
+    for index in range(encoder.generations()):
+        while not decoder.is_generation_complete(index):
+            payload = encoder.write_payload(index)
+
+            # Simulate that 25% of the packets are lost
+            if random.random() < 0.25:
+                continue
+
+            decoder.read_payload(payload)
+
+        print("Generation {} decoded".format(index))
+
+    # Check if we properly decoded the data
+    if decoder.is_complete() and decoder.output == data_in:
+        print("Data decoded correctly")
+    else:
+        print("Unexpected failure to decode please file a bug report :)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
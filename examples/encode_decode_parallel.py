@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+import io
+import os
+import sys
+import time
+
+import kodo
+import kodo_parallel
+
+
+def main():
+    """
+    Parallel object encoding and decoding example.
+
+    This example shows how to encode an object spanning many generations
+    with a pool of worker threads, each running its own encoders. The
+    payloads of the workers are interleaved into a single stream. On the
+    decoding side the payloads are routed to a pool of workers by their
+    generation, and the decoded generations are written out in order.
+    """
+    symbols = 32
+    symbol_size = 1400
+
+    # Create an object spanning a number of generations
+    data_in = os.urandom(40 * symbols * symbol_size + 123)
+
+    encoder = kodo_parallel.ParallelObjectEncoder(
+        kodo.FullVectorEncoderFactoryBinary8,
+        symbols,
+        symbol_size,
+        data_in,
+        redundancy=10)
+
+    output = io.BytesIO()
+    decoder = kodo_parallel.ParallelObjectDecoder(
+        kodo.FullVectorDecoderFactoryBinary8,
+        symbols,
+        symbol_size,
+        len(data_in),
+        output)
+
+    print("Coding {} generations with {} workers".format(
+        encoder.generations(), encoder.workers))
+
+    start = time.time()
+    sent = 0
+    for payload in encoder.payloads():
+        decoder.read_payload(payload)
+        sent += 1
+
+    # Wait for the decoding workers to finish
+    complete = decoder.wait(timeout=10)
+    decoder.close()
+
+    seconds = time.time() - start
+    print("Coded {} packets in {:.2f}s".format(sent, seconds))
+
+    # Check if we properly decoded the data
+    if complete and output.getvalue() == data_in:
+        print("Data decoded correctly")
+    else:
+        print("Unexpected failure to decode please file a bug report :)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
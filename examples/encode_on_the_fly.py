@@ -78,14 +78,12 @@ def main():
         print("Decoder received packet")
         print("Encoder rank = {}".format(encoder.rank()))
         print("Decoder rank = {}".format(decoder.rank()))
-        uncoded_symbol_indces = []
-        for i in range(decoder.symbols()):
-            if decoder.is_symbol_uncoded(i):
-                uncoded_symbol_indces.append(str(i))
 
-        print("Decoder uncoded = {} ({}) symbols".format(
+        # The symbols decoded since the last packet can be used right away
+        decoded_symbol_indices = decoder.take_decoded()
+        print("Decoder uncoded = {} symbols (new: {})".format(
             decoder.symbols_uncoded(),
-            " ".join(uncoded_symbol_indces)))
+            " ".join(str(i) for i in decoded_symbol_indices)))
         print("Decoder partially decoded = {}".format(
             decoder.symbols_partially_decoded()))
 
@@ -0,0 +1,863 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+"""
+Asynchronous UDP transport for object encoders and decoders.
+
+EncoderProtocol and DecoderProtocol are asyncio datagram protocols which
+send and receive the payloads of a kodo_object.ObjectEncoder and a
+kodo_object.ObjectDecoder. The decoder acknowledges every decoded generation,
+so the encoder stops sending it, and signals when the whole object is
+decoded. Both protocols resolve a future when the transfer ends, so many
+transfers can run concurrently on a single event loop without blocking or
+polling.
+
+The module uses async/await and requires Python 3.7 or later.
+
+Usage:
+
+    import kodo_asyncio
+
+    encoder = kodo_object.ObjectEncoder(encoder_factory, data)
+    sender = await kodo_asyncio.send_object(encoder, ('10.0.0.2', 41011))
+
+    decoder = kodo_object.ObjectDecoder(decoder_factory, object_size)
+    receiver = await kodo_asyncio.receive_object(decoder, ('0.0.0.0', 41011))
+
+Many transfers can also be multiplexed over a single port. Every datagram
+of a session is then prefixed with a session id, and a ServerProtocol keeps
+the decoders of the sessions in a table from which idle sessions are
+evicted:
+
+    transport, server = await kodo_asyncio.serve(
+        decoder_factory, ('0.0.0.0', 41011), handler)
+
+    sender = await kodo_asyncio.send_object(
+        encoder, ('10.0.0.2', 41011), session=kodo_asyncio.new_session())
+
+Requires Python 3.7 or later.
+"""
+
+import asyncio
+import collections
+import math
+import os
+import socket
+import struct
+
+import kodo_object
+import kodo_pacing
+
+# The control messages sent from the decoder to the encoder: the message
+# type and a generation index
+CONTROL = struct.Struct('!BI')
+
+# A generation is decoded
+ACK = 1
+
+# The whole object is decoded
+STOP = 2
+
+# The state of a generation which is being decoded, followed by RANK
+REPORT = 3
+
+# The rank of the decoder of a generation and the number of payloads of the
+# generation received so far
+RANK = struct.Struct('!II')
+
+# The header prepended to every datagram of a multiplexed session: the
+# session id and the size of the object
+SESSION = struct.Struct('!QQ')
+
+# The default limit on the size of the objects of the sessions on a server.
+# The size is read from the first datagram of a session, which anyone can
+# send, so it must be bounded before memory is allocated for the object.
+MAX_OBJECT_SIZE = 64 * 1024 * 1024
+
+# The default limits on the number of sessions on a server and on the total
+# size of their objects, so a stream of new session ids cannot allocate
+# unbounded memory before the idle sessions are evicted
+MAX_SESSIONS = 64
+MAX_TOTAL_SIZE = 256 * 1024 * 1024
+
+
+def new_session():
+    """Return a random session id."""
+    return struct.unpack('!Q', os.urandom(8))[0]
+
+
+class EncoderProtocol(asyncio.DatagramProtocol):
+
+    """Datagram protocol which sends the payloads of an ObjectEncoder."""
+
+    def __init__(self, encoder, remote_address=None, rate=None,
+                 max_redundancy=200, window=4, timeout=1.0, burst=16,
+                 session=None, controller=None, feedback_timeout=0.2,
+                 metrics=None):
+        """
+        Create EncoderProtocol.
+
+        The generations are sent a window at a time: one payload of every
+        generation in the window is sent in turn, and a generation leaves the
+        window when it is acknowledged or its redundancy is exhausted.
+
+        With a controller, only the payloads computed by the controller are
+        sent for a generation. More payloads are sent when the decoder
+        reports the rank of the generation, or a single payload if no report
+        arrives within the feedback timeout.
+
+        :param encoder: The kodo_object.ObjectEncoder to send. Its
+                        max_encoders is raised to the window size, so the
+                        encoders of the window are kept in memory.
+        :param remote_address: The address of the decoder, or None if the
+                               transport is connected.
+        :param rate: The maximum rate in bits per second, or None to send as
+                     fast as the transport accepts the payloads.
+        :param max_redundancy: The maximum amount of redundancy sent for each
+                               generation in percent of its symbols.
+        :param window: The number of generations sent concurrently.
+        :param timeout: The time in seconds to wait for the decoder to signal
+                        completion once everything has been sent.
+        :param burst: The number of payloads which may be sent back to back,
+                      i.e. the size of the token bucket when the rate is
+                      limited. The protocol yields to the event loop after
+                      each burst.
+        :param session: The session id if the decoder is a ServerProtocol,
+                        or None.
+        :param controller: A kodo_redundancy.RedundancyController, or None
+                           to send payloads until the maximum redundancy is
+                           reached.
+        :param feedback_timeout: The time in seconds to wait for a report
+                                 when the controller allows no more payloads.
+        :param metrics: A kodo_metrics.CodingMetrics which counts the
+                        payloads and the session, or None.
+        """
+        self.encoder = encoder
+        self.remote_address = remote_address
+        self.rate = rate
+        self.window = window
+        self.timeout = timeout
+        self.burst = burst
+        self.session = session
+        self.controller = controller
+        self.feedback_timeout = feedback_timeout
+        self.metrics = metrics
+        self.sent = 0
+        self.done = asyncio.get_event_loop().create_future()
+
+        encoder.max_encoders = max(encoder.max_encoders, window)
+
+        generations = encoder.generations()
+        self.__acked = [False] * generations
+        self.__remaining = [
+            int(math.ceil(
+                encoder.generation(i)[2] * (1 + max_redundancy / 100.0)))
+            for i in range(generations)]
+
+        # The payloads which may be sent before the next report
+        self.__credits = list(self.__remaining)
+        if controller is not None:
+            self.__credits = [
+                min(controller.payloads(encoder.generation(i)[2]), budget)
+                for i, budget in enumerate(self.__remaining)]
+
+        # The payloads sent per generation, and the payloads sent and
+        # received as of the last report used by the controller
+        self.__sent = [0] * generations
+        self.__reported = [(0, 0)] * generations
+        self.__feedback = asyncio.Event()
+
+        self.__header = b''
+        if session is not None:
+            self.__header = SESSION.pack(session, len(encoder.data))
+
+        self.__buffer = bytearray(
+            len(self.__header) + encoder.payload_size())
+        self.__buffer[:len(self.__header)] = self.__header
+        self.__writable = asyncio.Event()
+        self.__writable.set()
+        self.__bucket = None
+        if rate is not None:
+            self.__bucket = kodo_pacing.TokenBucket(
+                rate, burst * len(self.__buffer))
+
+        self.__transport = None
+        self.__task = None
+        self.__open = False
+
+    def connection_made(self, transport):
+        self.__transport = transport
+        self.__task = asyncio.ensure_future(self.__send())
+        if self.metrics is not None:
+            self.metrics.session_opened('sender')
+            self.__open = True
+
+    def datagram_received(self, data, address):
+        header = len(self.__header)
+        if len(data) < header + CONTROL.size or \
+                data[:header] != self.__header:
+            return
+
+        kind, index = CONTROL.unpack_from(data, header)
+        if kind == STOP:
+            self.__finish(True)
+        elif index >= len(self.__acked):
+            return
+        elif kind == ACK:
+            self.__acked[index] = True
+            self.__feedback.set()
+        elif kind == REPORT and \
+                len(data) == header + CONTROL.size + RANK.size:
+            rank, received = RANK.unpack_from(data, header + CONTROL.size)
+            self.__report(index, rank, received)
+
+    def __report(self, index, rank, received):
+        """Grant more payloads to a generation from the report of its rank."""
+        # Reports are only used once the payloads granted so far are sent,
+        # so the report reflects them
+        if self.controller is None or self.__acked[index] or \
+                self.__credits[index] > 0:
+            return
+
+        sent, reported = self.__reported[index]
+        self.controller.report(
+            self.__sent[index] - sent, received - reported)
+        self.__reported[index] = (self.__sent[index], received)
+
+        missing = self.encoder.generation(index)[2] - rank
+        self.__credits[index] = min(
+            self.controller.payloads(missing), self.__remaining[index])
+        self.__feedback.set()
+
+    def error_received(self, exc):
+        # E.g. the decoder is not listening yet, keep sending
+        pass
+
+    def connection_lost(self, exc):
+        if exc is not None and not self.done.done():
+            self.done.set_exception(exc)
+        self.__finish(False)
+
+    def pause_writing(self):
+        self.__writable.clear()
+
+    def resume_writing(self):
+        self.__writable.set()
+
+    def close(self):
+        """Stop sending and close the transport."""
+        self.__finish(False)
+
+    def __finish(self, result):
+        if not self.done.done():
+            self.done.set_result(result)
+        if self.__open:
+            self.__open = False
+            self.metrics.session_closed(
+                'sender', 'completed' if result else 'failed')
+        if self.__task is not None and \
+                self.__task is not asyncio.current_task():
+            self.__task.cancel()
+        if self.__transport is not None:
+            self.__transport.close()
+
+    async def __send(self):
+        """Send the generations until they are acknowledged or exhausted."""
+        try:
+            view = memoryview(self.__buffer)
+            pending = collections.deque(range(self.encoder.generations()))
+            active = []
+
+            while not self.done.done():
+                active = [i for i in active
+                          if not self.__acked[i] and self.__remaining[i] > 0]
+                while pending and len(active) < self.window:
+                    index = pending.popleft()
+                    if not self.__acked[index]:
+                        active.append(index)
+                if not active:
+                    break
+
+                if not [i for i in active if self.__credits[i] > 0]:
+                    await self.__wait_for_feedback(active)
+                    continue
+
+                for index in active:
+                    await self.__writable.wait()
+                    if self.done.done():
+                        return
+                    if self.__acked[index] or self.__credits[index] == 0:
+                        continue
+
+                    length = len(self.__header) + \
+                        self.encoder.write_payload_into(
+                            self.__buffer, index, len(self.__header))
+
+                    if self.__bucket is not None:
+                        delay = self.__bucket.consume(length)
+                        if delay >= self.__bucket.min_sleep:
+                            await asyncio.sleep(delay)
+                            if self.done.done():
+                                return
+
+                    self.__transport.sendto(
+                        view[:length], self.remote_address)
+                    self.__remaining[index] -= 1
+                    self.__credits[index] -= 1
+                    self.__sent[index] += 1
+                    self.sent += 1
+                    if self.metrics is not None:
+                        self.metrics.payload_sent(length)
+
+                    if self.sent % self.burst == 0:
+                        await asyncio.sleep(0)
+
+            # Everything is sent, wait for the decoder to complete
+            await asyncio.wait_for(asyncio.shield(self.done), self.timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.__finish(False)
+        except Exception as e:
+            if not self.done.done():
+                self.done.set_exception(e)
+            self.__finish(False)
+
+    async def __wait_for_feedback(self, active):
+        """Wait for a report or an acknowledgement of the generations."""
+        self.__feedback.clear()
+        try:
+            await asyncio.wait_for(
+                self.__feedback.wait(), self.feedback_timeout)
+        except asyncio.TimeoutError:
+            # The reports may be lost, send a payload to trigger a new one
+            for index in active:
+                self.__credits[index] = 1
+
+
+class RankReports(object):
+
+    """The reports of the generations which are being decoded."""
+
+    def __init__(self):
+        self.__received = collections.Counter()
+
+    def add(self, index):
+        """
+        Count a payload received for a generation.
+
+        :param index: The index of the generation.
+        """
+        self.__received[index] += 1
+
+    def messages(self, decoder, header=b''):
+        """
+        Return the report messages of the incomplete generations.
+
+        :param decoder: The kodo_object.ObjectDecoder.
+        :param header: The session header prepended to the messages.
+        """
+        messages = []
+        for index in list(self.__received):
+            if decoder.is_generation_complete(index):
+                del self.__received[index]
+                continue
+            messages.append(
+                header + CONTROL.pack(REPORT, index) +
+                RANK.pack(decoder.rank(index), self.__received[index]))
+        return messages
+
+
+class DecoderProtocol(asyncio.DatagramProtocol):
+
+    """Datagram protocol which decodes payloads with an ObjectDecoder."""
+
+    def __init__(self, decoder, timeout=None, linger=1.0,
+                 report_interval=0.05, metrics=None):
+        """
+        Create DecoderProtocol.
+
+        :param decoder: The kodo_object.ObjectDecoder to decode into.
+        :param timeout: The time in seconds without any payloads after which
+                        the transfer fails, or None to wait forever.
+        :param linger: The time in seconds the transport is kept open after
+                       the object is decoded, so late payloads are answered
+                       with a stop message in case the first one is lost.
+        :param report_interval: The time in seconds between the reports of
+                                the rank of the incomplete generations, or
+                                None to send no reports.
+        :param metrics: A kodo_metrics.CodingMetrics which tracks the
+                        payloads, the generations and the session, or None.
+        """
+        self.decoder = decoder
+        self.timeout = timeout
+        self.linger = linger
+        self.report_interval = report_interval
+        self.metrics = metrics
+        self.received = 0
+        self.done = asyncio.get_event_loop().create_future()
+
+        self.__transport = None
+        self.__timer = None
+        self.__report_timer = None
+        self.__reports = RankReports()
+        self.__address = None
+        self.__last = None
+        self.__open = False
+
+    def connection_made(self, transport):
+        self.__transport = transport
+        if self.metrics is not None:
+            self.metrics.session_opened('receiver')
+            self.__open = True
+        if self.decoder.is_complete():
+            self.__finish(True)
+            return
+
+        if self.timeout is not None:
+            self.__last = asyncio.get_event_loop().time()
+            self.__check_timeout()
+        if self.report_interval is not None:
+            self.__report_timer = asyncio.get_event_loop().call_later(
+                self.report_interval, self.__send_reports)
+
+    def datagram_received(self, data, address):
+        self.__last = asyncio.get_event_loop().time()
+        self.__address = address
+
+        if self.decoder.is_complete():
+            self.__transport.sendto(CONTROL.pack(STOP, 0), address)
+            return
+
+        try:
+            index = self.decoder.read_payload(data)
+        except (ValueError, struct.error):
+            return
+        self.received += 1
+        if self.metrics is not None:
+            self.metrics.payload_received(
+                len(data), index, self.decoder.rank(index),
+                self.decoder.generation(index)[2], self)
+
+        if self.decoder.is_complete():
+            self.__transport.sendto(CONTROL.pack(STOP, 0), address)
+            self.__finish(True)
+        elif self.decoder.is_generation_complete(index):
+            # Acknowledged again for every late payload in case the first
+            # acknowledgement is lost
+            self.__transport.sendto(CONTROL.pack(ACK, index), address)
+        else:
+            self.__reports.add(index)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        if exc is not None and not self.done.done():
+            self.done.set_exception(exc)
+        self.__finish(False)
+
+    def close(self):
+        """Stop decoding and close the transport."""
+        self.__finish(False)
+        self.__transport.close()
+
+    def __finish(self, result):
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        if self.__report_timer is not None:
+            self.__report_timer.cancel()
+            self.__report_timer = None
+        if self.__open:
+            self.__open = False
+            self.metrics.session_closed(
+                'receiver', 'completed' if result else 'failed', self)
+
+        if self.done.done():
+            return
+        self.done.set_result(result)
+
+        if result:
+            asyncio.get_event_loop().call_later(
+                self.linger, self.__transport.close)
+        else:
+            self.__transport.close()
+
+    def __check_timeout(self):
+        idle = asyncio.get_event_loop().time() - self.__last
+        if idle >= self.timeout:
+            self.__timer = None
+            self.__finish(False)
+        else:
+            self.__timer = asyncio.get_event_loop().call_later(
+                self.timeout - idle, self.__check_timeout)
+
+    def __send_reports(self):
+        if self.__address is not None:
+            for message in self.__reports.messages(self.decoder):
+                self.__transport.sendto(message, self.__address)
+        self.__report_timer = asyncio.get_event_loop().call_later(
+            self.report_interval, self.__send_reports)
+
+
+class Session(object):
+
+    """The state of a multiplexed session."""
+
+    def __init__(self, session, address, decoder, now):
+        """
+        Create Session.
+
+        :param session: The session id.
+        :param address: The address of the encoder.
+        :param decoder: The kodo_object.ObjectDecoder of the session.
+        :param now: The time of the first payload according to the clock of
+                    the event loop.
+        """
+        self.session = session
+        self.address = address
+        self.decoder = decoder
+        self.reports = RankReports()
+        self.received = 0
+        self.last = now
+
+
+class SessionTable(object):
+
+    """Table of sessions ordered by their last activity."""
+
+    def __init__(self, timeout, max_sessions=None):
+        """
+        Create SessionTable.
+
+        :param timeout: The time in seconds without any payloads after which
+                        a session is evicted.
+        :param max_sessions: The maximum number of sessions, or None for no
+                             limit.
+        """
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.__sessions = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.__sessions)
+
+    def __contains__(self, session):
+        return session in self.__sessions
+
+    def __iter__(self):
+        return iter(list(self.__sessions.values()))
+
+    def is_full(self):
+        """Check whether no more sessions can be added."""
+        return self.max_sessions is not None and \
+            len(self.__sessions) >= self.max_sessions
+
+    def get(self, session, now):
+        """
+        Return a session and mark it as active.
+
+        :param session: The session id.
+        :param now: The current time according to the clock of the loop.
+        :returns: The Session or None if the session is unknown.
+        """
+        state = self.__sessions.get(session)
+        if state is not None:
+            state.last = now
+            self.__sessions.move_to_end(session)
+        return state
+
+    def add(self, state):
+        """
+        Add a session.
+
+        :param state: The Session.
+        """
+        self.__sessions[state.session] = state
+
+    def pop(self, session):
+        """
+        Remove a session.
+
+        :param session: The session id.
+        :returns: The Session or None if the session is unknown.
+        """
+        return self.__sessions.pop(session, None)
+
+    def evict(self, now):
+        """
+        Remove the sessions which have been idle for longer than the timeout.
+
+        :param now: The current time according to the clock of the loop.
+        :returns: The list of evicted sessions.
+        """
+        evicted = []
+        while self.__sessions:
+            state = next(iter(self.__sessions.values()))
+            if now - state.last < self.timeout:
+                break
+            evicted.append(self.__sessions.popitem(last=False)[1])
+        return evicted
+
+
+class ServerProtocol(asyncio.DatagramProtocol):
+
+    """Datagram protocol which decodes many sessions on a single port."""
+
+    def __init__(self, factory, handler=None, timeout=10.0,
+                 max_sessions=MAX_SESSIONS, max_object_size=MAX_OBJECT_SIZE,
+                 max_total_size=MAX_TOTAL_SIZE, report_interval=0.05,
+                 metrics=None):
+        """
+        Create ServerProtocol.
+
+        A session is created by its first payload, which carries the size of
+        the object in the session header. The decoders of all sessions are
+        built from the same factory and recycled through a shared CoderPool.
+
+        :param factory: The decoder factory.
+        :param handler: A function called with the Session when its object
+                        is decoded.
+        :param timeout: The time in seconds without any payloads after which
+                        a session is evicted. Decoded sessions are kept until
+                        then, so late payloads are answered with a stop
+                        message.
+        :param max_sessions: The maximum number of concurrent sessions, or
+                             None for no limit. New sessions are refused
+                             when the table is full.
+        :param max_object_size: The maximum size of an object in bytes. Larger
+                                objects are refused since every object is
+                                decoded into memory, as are sessions whose
+                                decoder cannot be allocated.
+        :param max_total_size: The maximum total size in bytes of the objects
+                               of all sessions, or None for no limit. New
+                               sessions are refused when their object does
+                               not fit.
+        :param report_interval: The time in seconds between the reports of
+                                the rank of the incomplete generations, or
+                                None to send no reports.
+        :param metrics: A kodo_metrics.CodingMetrics which tracks the
+                        payloads, the generations and the sessions, or None.
+        """
+        self.factory = factory
+        self.handler = handler
+        self.max_object_size = max_object_size
+        self.max_total_size = max_total_size
+        self.report_interval = report_interval
+        self.metrics = metrics
+        self.pool = kodo_object.CoderPool(factory)
+        self.sessions = SessionTable(timeout, max_sessions)
+        self.completed = 0
+        self.evicted = 0
+        self.refused = 0
+
+        self.__transport = None
+        self.__timer = None
+        self.__report_timer = None
+
+    def connection_made(self, transport):
+        self.__transport = transport
+        self.__schedule_eviction()
+        if self.report_interval is not None:
+            self.__report_timer = asyncio.get_event_loop().call_later(
+                self.report_interval, self.__send_reports)
+
+    def datagram_received(self, data, address):
+        if len(data) < SESSION.size:
+            return
+
+        now = asyncio.get_event_loop().time()
+        session_id, object_size = SESSION.unpack_from(data)
+        session = self.sessions.get(session_id, now)
+
+        if session is None:
+            if self.sessions.is_full() or \
+                    object_size > self.max_object_size or \
+                    not self.__fits(object_size):
+                self.__refuse()
+                return
+            try:
+                decoder = kodo_object.ObjectDecoder(
+                    self.factory, object_size, pool=self.pool)
+            except (MemoryError, OverflowError, ValueError):
+                self.__refuse()
+                return
+            session = Session(session_id, address, decoder, now)
+            self.sessions.add(session)
+            if self.metrics is not None:
+                self.metrics.session_opened('receiver')
+        elif session.decoder.object_size != object_size:
+            return
+
+        # Follow the encoder if its address changes, e.g. behind a NAT
+        session.address = address
+        header = data[:SESSION.size]
+        decoder = session.decoder
+
+        if decoder.is_complete():
+            self.__reply(header, STOP, 0, address)
+            return
+
+        try:
+            index = decoder.read_payload(memoryview(data)[SESSION.size:])
+        except (ValueError, struct.error):
+            return
+        session.received += 1
+        if self.metrics is not None:
+            self.metrics.payload_received(
+                len(data), index, decoder.rank(index),
+                decoder.generation(index)[2], session_id)
+
+        if decoder.is_complete():
+            self.completed += 1
+            if self.metrics is not None:
+                self.metrics.session_closed(
+                    'receiver', 'completed', session_id)
+            self.__reply(header, STOP, 0, address)
+            if self.handler is not None:
+                self.handler(session)
+        elif decoder.is_generation_complete(index):
+            self.__reply(header, ACK, index, address)
+        else:
+            session.reports.add(index)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        if self.__report_timer is not None:
+            self.__report_timer.cancel()
+            self.__report_timer = None
+
+    def close(self):
+        """Close the transport and discard all sessions."""
+        for session in self.sessions:
+            self.sessions.pop(session.session)
+            if self.metrics is not None and \
+                    not session.decoder.is_complete():
+                self.metrics.session_closed(
+                    'receiver', 'failed', session.session)
+            session.decoder.close()
+        self.__transport.close()
+
+    def __fits(self, object_size):
+        if self.max_total_size is None:
+            return True
+        total = sum(s.decoder.object_size for s in self.sessions)
+        return total + object_size <= self.max_total_size
+
+    def __refuse(self):
+        self.refused += 1
+        if self.metrics is not None:
+            self.metrics.session_refused('receiver')
+
+    def __reply(self, header, kind, index, address):
+        self.__transport.sendto(header + CONTROL.pack(kind, index), address)
+
+    def __send_reports(self):
+        for session in self.sessions:
+            if session.decoder.is_complete():
+                continue
+            header = SESSION.pack(
+                session.session, session.decoder.object_size)
+            for message in session.reports.messages(session.decoder, header):
+                self.__transport.sendto(message, session.address)
+        self.__report_timer = asyncio.get_event_loop().call_later(
+            self.report_interval, self.__send_reports)
+
+    def __schedule_eviction(self):
+        self.__timer = asyncio.get_event_loop().call_later(
+            self.sessions.timeout / 2.0, self.__evict)
+
+    def __evict(self):
+        """Evict the idle sessions and recycle their decoders."""
+        for session in self.sessions.evict(asyncio.get_event_loop().time()):
+            if not session.decoder.is_complete():
+                self.evicted += 1
+                if self.metrics is not None:
+                    self.metrics.session_closed(
+                        'receiver', 'evicted', session.session)
+            session.decoder.close()
+        self.__schedule_eviction()
+
+
+async def send_object(encoder, remote_address, local_address=None,
+                      **kwargs):
+    """
+    Send an object and wait until it is decoded or everything is sent.
+
+    :param encoder: The kodo_object.ObjectEncoder to send.
+    :param remote_address: The (host, port) address of the decoder.
+    :param local_address: The local (host, port) address, which receives the
+                          control messages of the decoder.
+    :param kwargs: Additional arguments for EncoderProtocol.
+    :returns: The EncoderProtocol. Its done future holds True if the decoder
+              signalled completion.
+    """
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: EncoderProtocol(encoder, **kwargs),
+        local_addr=local_address, remote_addr=remote_address)
+    try:
+        await protocol.done
+    except asyncio.CancelledError:
+        transport.close()
+        raise
+    return protocol
+
+
+async def receive_object(decoder, local_address, **kwargs):
+    """
+    Receive an object and wait until it is decoded or the transfer fails.
+
+    :param decoder: The kodo_object.ObjectDecoder to decode into.
+    :param local_address: The local (host, port) address to listen on.
+    :param kwargs: Additional arguments for DecoderProtocol.
+    :returns: The DecoderProtocol. Its done future holds True if the object
+              is decoded.
+    """
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: DecoderProtocol(decoder, **kwargs), local_addr=local_address)
+    try:
+        await protocol.done
+    except asyncio.CancelledError:
+        transport.close()
+        raise
+    return protocol
+
+
+async def serve(factory, local_address, handler=None,
+                receive_buffer_size=None, **kwargs):
+    """
+    Start a server which decodes multiplexed sessions on a single port.
+
+    :param factory: The decoder factory used for all sessions.
+    :param local_address: The local (host, port) address to listen on.
+    :param handler: A function called with the Session when its object is
+                    decoded.
+    :param receive_buffer_size: The size of the socket receive buffer in
+                                bytes. All sessions share the socket, so the
+                                default size is easily overrun by the bursts
+                                of many encoders.
+    :param kwargs: Additional arguments for ServerProtocol.
+    :returns: The (transport, ServerProtocol) tuple.
+    """
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: ServerProtocol(factory, handler, **kwargs),
+        local_addr=local_address)
+
+    if receive_buffer_size is not None:
+        transport.get_extra_info('socket').setsockopt(
+            socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer_size)
+    return transport, protocol
@@ -0,0 +1,371 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+"""
+Batched datagram I/O for coded payloads.
+
+BatchSocket moves a batch of datagrams per system call using sendmmsg and
+recvmmsg on Linux, and falls back to one datagram per call elsewhere. The
+datagrams are sent from and received into preallocated buffers, which the
+encoders write into and the decoders read from directly.
+
+Usage:
+
+    import kodo_batch
+
+    batch = kodo_batch.BatchSocket(sock, count=64, size=1500)
+
+    # Sender
+    batch.send_payloads(encoder, address=('10.0.0.2', 41011))
+
+    # Receiver
+    while not decoder.is_complete():
+        batch.read_payloads(decoder)
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import socket
+import struct
+import sys
+
+# Return from recvmmsg as soon as one datagram is received
+MSG_WAITFORONE = 0x10000
+
+
+class _iovec(ctypes.Structure):
+    _fields_ = [
+        ('iov_base', ctypes.c_void_p),
+        ('iov_len', ctypes.c_size_t)]
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(_iovec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int)]
+
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_hdr', _msghdr),
+        ('msg_len', ctypes.c_uint)]
+
+
+def _load_mmsg():
+    """Return the sendmmsg and recvmmsg functions of libc, if available."""
+    if not sys.platform.startswith('linux'):
+        return None, None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        sendmmsg = libc.sendmmsg
+        recvmmsg = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None, None
+
+    sendmmsg.argtypes = [
+        ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    recvmmsg.argtypes = [
+        ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int,
+        ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    return sendmmsg, recvmmsg
+
+
+_sendmmsg, _recvmmsg = _load_mmsg()
+
+# The size of a sockaddr_storage
+_ADDRESS_SIZE = 128
+
+
+def _pack_address(family, address):
+    """Pack an (host, port) address into a sockaddr structure."""
+    host, port = address[:2]
+    if family == socket.AF_INET:
+        return struct.pack(
+            '=HH4s8x', family, socket.htons(port),
+            socket.inet_aton(host))
+    if family == socket.AF_INET6:
+        flowinfo, scope_id = (tuple(address[2:4]) + (0, 0))[:2]
+        return struct.pack(
+            '=HHI16sI', family, socket.htons(port), socket.htonl(flowinfo),
+            socket.inet_pton(socket.AF_INET6, host), scope_id)
+    return None
+
+
+def _unpack_address(data):
+    """Unpack a sockaddr structure into an address tuple."""
+    family, = struct.unpack_from('=H', data)
+    if family == socket.AF_INET:
+        port, host = struct.unpack_from('!H4s', data, 2)
+        return (socket.inet_ntoa(host), port)
+    if family == socket.AF_INET6:
+        port, flowinfo, host = struct.unpack_from('!HI16s', data, 2)
+        scope_id, = struct.unpack_from('=I', data, 24)
+        return (socket.inet_ntop(socket.AF_INET6, host), port, flowinfo,
+                scope_id)
+    return None
+
+
+class BatchSocket(object):
+
+    """Datagram socket which sends and receives batches of payloads."""
+
+    def __init__(self, sock, count=64, size=1500, native=None):
+        """
+        Create BatchSocket.
+
+        :param sock: The datagram socket. Both blocking sockets and sockets
+                     with a timeout are supported.
+        :param count: The maximum number of datagrams per batch.
+        :param size: The maximum size of a datagram in bytes.
+        :param native: Use sendmmsg and recvmmsg. Defaults to True where they
+                       are available.
+        """
+        if native is None:
+            native = _sendmmsg is not None
+        elif native and _sendmmsg is None:
+            raise ValueError("sendmmsg and recvmmsg are not available.")
+
+        self.socket = sock
+        self.count = count
+        self.size = size
+        self.native = native
+
+        # The received datagrams are stored in fixed slots, while the sent
+        # datagrams are packed back to back as written by the encoders
+        self.buffer = bytearray(count * size)
+        self.send_buffer = bytearray(count * size)
+        self.lengths = [0] * count
+        self.addresses = [None] * count
+        self.received = 0
+
+        self.__view = memoryview(self.buffer)
+
+        if native:
+            self.__init_native()
+
+    def __init_native(self):
+        """Preallocate the message headers pointing into the buffers."""
+        count = self.count
+        self.__iovecs = (_iovec * count)()
+        self.__messages = (_mmsghdr * count)()
+        self.__names = ctypes.create_string_buffer(count * _ADDRESS_SIZE)
+        self.__memory = (ctypes.c_char * len(self.buffer)).from_buffer(
+            self.buffer)
+        self.__send_memory = (ctypes.c_char * len(self.send_buffer)) \
+            .from_buffer(self.send_buffer)
+
+        self.__base = ctypes.addressof(self.__memory)
+        self.__send_base = ctypes.addressof(self.__send_memory)
+        self.__names_base = ctypes.addressof(self.__names)
+
+        for i in range(count):
+            header = self.__messages[i].msg_hdr
+            header.msg_iov = ctypes.pointer(self.__iovecs[i])
+            header.msg_iovlen = 1
+
+    def payload(self, index):
+        """
+        Return a received datagram.
+
+        :param index: The index of the datagram in the last batch.
+        :returns: A writable memoryview into the receive buffer, which is
+                  valid until the next call to receive().
+        """
+        offset = index * self.size
+        return self.__view[offset:offset + self.lengths[index]]
+
+    def payloads(self):
+        """Return the datagrams received by the last call to receive()."""
+        return [self.payload(i) for i in range(self.received)]
+
+    def receive(self):
+        """
+        Receive a batch of datagrams.
+
+        Waits for the first datagram according to the timeout of the socket,
+        and returns the datagrams which are already queued along with it.
+
+        :returns: The number of datagrams received.
+        """
+        if self.native:
+            self.received = self.__receive_native()
+        else:
+            self.received = self.__receive_fallback()
+        return self.received
+
+    def read_payloads(self, decoder):
+        """
+        Receive a batch of datagrams and decode them.
+
+        The payloads are decoded in place in the receive buffer.
+
+        :param decoder: The decoder, which must support read_payloads().
+        :returns: The number of payloads consumed by the decoder.
+        """
+        self.receive()
+        return decoder.read_payloads(self.payloads(), inplace=True)
+
+    def send(self, data, lengths, address=None):
+        """
+        Send a batch of datagrams packed back to back in a buffer.
+
+        :param data: The buffer with the datagrams.
+        :param lengths: The length of each datagram.
+        :param address: The destination address, or None if the socket is
+                        connected.
+        """
+        if self.native and data is self.send_buffer:
+            if len(lengths) > self.count:
+                raise ValueError("Too many datagrams in the batch.")
+            self.__send_native(lengths, address)
+            return
+
+        view = memoryview(data)
+        offset = 0
+        for length in lengths:
+            datagram = view[offset:offset + length]
+            if address is None:
+                self.socket.send(datagram)
+            else:
+                self.socket.sendto(datagram, address)
+            offset += length
+
+    def send_payloads(self, encoder, count=None, address=None):
+        """
+        Encode a batch of payloads and send them.
+
+        :param encoder: The encoder, which must support write_payloads_into().
+        :param count: The number of payloads. Defaults to the batch size.
+        :param address: The destination address, or None if the socket is
+                        connected.
+        :returns: The number of payloads sent.
+        """
+        if count is None:
+            count = self.count
+        count = min(count, len(self.send_buffer) // encoder.payload_size())
+
+        lengths = encoder.write_payloads_into(self.send_buffer, count)
+        self.send(self.send_buffer, lengths, address)
+        return count
+
+    def __wait(self, readable):
+        """Wait until the socket is ready if it has a timeout."""
+        timeout = self.socket.gettimeout()
+        if not timeout:
+            return
+
+        fd = self.socket.fileno()
+        if readable:
+            ready = select.select([fd], [], [], timeout)[0]
+        else:
+            ready = select.select([], [fd], [], timeout)[1]
+        if not ready:
+            raise socket.timeout("timed out")
+
+    def __receive_native(self):
+        for i in range(self.count):
+            self.__iovecs[i].iov_base = self.__base + i * self.size
+            self.__iovecs[i].iov_len = self.size
+            header = self.__messages[i].msg_hdr
+            header.msg_name = self.__names_base + i * _ADDRESS_SIZE
+            header.msg_namelen = _ADDRESS_SIZE
+
+        while True:
+            self.__wait(readable=True)
+            received = _recvmmsg(
+                self.socket.fileno(), self.__messages, self.count,
+                MSG_WAITFORONE, None)
+            if received >= 0:
+                break
+            error = ctypes.get_errno()
+            if error == errno.EINTR:
+                continue
+            if error in (errno.EAGAIN, errno.EWOULDBLOCK) and \
+                    self.socket.gettimeout():
+                continue
+            raise OSError(error, os.strerror(error))
+
+        names = self.__names.raw
+        for i in range(received):
+            message = self.__messages[i]
+            self.lengths[i] = message.msg_len
+            name_length = message.msg_hdr.msg_namelen
+            offset = i * _ADDRESS_SIZE
+            self.addresses[i] = _unpack_address(
+                names[offset:offset + name_length]) if name_length else None
+        return received
+
+    def __receive_fallback(self):
+        fd = self.socket.fileno()
+        received = 0
+        while received < self.count:
+            # Only wait for the first datagram, the rest of the batch are
+            # the datagrams which are already queued
+            if received > 0 and not select.select([fd], [], [], 0)[0]:
+                break
+
+            offset = received * self.size
+            length, address = self.socket.recvfrom_into(
+                self.__view[offset:offset + self.size], self.size)
+            self.lengths[received] = length
+            self.addresses[received] = address
+            received += 1
+        return received
+
+    def __send_native(self, lengths, address):
+        name = None
+        if address is not None:
+            name = _pack_address(self.socket.family, address)
+            if name is None:
+                raise ValueError("Unsupported address family.")
+            name = ctypes.create_string_buffer(name, len(name))
+
+        offset = 0
+        for i, length in enumerate(lengths):
+            self.__iovecs[i].iov_base = self.__send_base + offset
+            self.__iovecs[i].iov_len = length
+            header = self.__messages[i].msg_hdr
+            if name is None:
+                header.msg_name = None
+                header.msg_namelen = 0
+            else:
+                header.msg_name = ctypes.addressof(name)
+                header.msg_namelen = len(name)
+            offset += length
+
+        sent = 0
+        while sent < len(lengths):
+            result = _sendmmsg(
+                self.socket.fileno(),
+                ctypes.cast(
+                    ctypes.byref(self.__messages, sent * ctypes.sizeof(
+                        _mmsghdr)),
+                    ctypes.POINTER(_mmsghdr)),
+                len(lengths) - sent, 0)
+            if result >= 0:
+                sent += result
+                continue
+
+            error = ctypes.get_errno()
+            if error == errno.EINTR:
+                continue
+            if error in (errno.EAGAIN, errno.EWOULDBLOCK) and \
+                    self.socket.gettimeout():
+                self.__wait(readable=False)
+                continue
+            raise OSError(error, os.strerror(error))
@@ -177,33 +177,34 @@ class DecodeStateViewer(StateViewer):
 
     """Class for displaying the decoding coefficients."""
 
+    # We are only interested in the decoder state.
+    zones = ["decoder_state"]
+
     def __init__(self, size, canvas, canvas_position=(0, 0)):
         """Create DecodeStateViewer."""
         super(DecodeStateViewer, self).__init__(
             size, canvas, canvas_position)
 
-    def trace_callback(self, zone, message):
-        """Callback to be used with the decoder trace API."""
-        # We are only interested in the decoder state.
+    def trace_callback(self, zone, rows):
+        """
+        Callback to be used with the decoder set_trace_events API.
+
+        Each row of the decoder state is the symbol index, the symbol state
+        and the coefficients.
+        """
         if zone != "decoder_state":
             return
 
-        decode_state = []
-        for line in message.split('\n'):
-            if not line:
-                continue
-            line = line.split()
-
-            # Add the decoding state
-            decode_state.append([int(i) for i in line[2:]])
-
-        self.show_decode_state(decode_state)
+        self.show_decode_state([row[2:] for row in rows])
 
 
 class EncodeStateViewer(StateViewer):
 
     """Class for displaying the encoding coefficients."""
 
+    zones = ["set_const_symbols", "symbol_index_after_write_uncoded_symbol",
+             "symbol_coefficients_after_write_symbol"]
+
     def __init__(self, size, canvas, canvas_position=(0, 0),
                  wrap_around=False):
         """Create EncodeStateViewer."""
@@ -212,13 +213,12 @@ class EncodeStateViewer(StateViewer):
         # if true, wrap_around, else push up.
         self.wrap_around = wrap_around
 
-    def trace_callback(self, zone, message):
-        """Callback to be used with the encoder trace API."""
+    def trace_callback(self, zone, rows):
+        """Callback to be used with the encoder set_trace_events API."""
         if zone == "set_const_symbols":
-            for line in reversed(message.split('\n')):
-                elements = line.split()
-                if len(elements) > 1 and elements[1] == 'I:':
-                    self.symbols = int(elements[0]) + 1
+            for row in reversed(rows):
+                if len(row) > 1 and row[1] == 'I:':
+                    self.symbols = row[0] + 1
                     break
 
             self.state = [[] for i in range(self.symbols)]
@@ -226,13 +226,12 @@ class EncodeStateViewer(StateViewer):
             return
 
         if zone == "symbol_index_after_write_uncoded_symbol":
-            index = int(message.split(' ')[-1])
+            index = rows[-1][-1]
             symbol = [0 for i in range(self.symbols)]
             symbol[index] = 1
 
         elif zone == "symbol_coefficients_after_write_symbol":
-            symbol = message[3:].split(' ')[:-1]
-            symbol = map(int, symbol)
+            symbol = list(rows[0][1:])
         else:
             return
 
@@ -266,15 +265,16 @@ class ImageViewer(object):
         self.canvas = canvas
         self.canvas_position = canvas_position
 
-    def set_image(self, image_string):
+    def set_image(self, image_data):
         """
-        Display the provided string as an image.
+        Display the provided data as an image.
 
-        The string should be a string representation of a numpy 3d array,
-        and it should be equal to or larger than width * height * 3.
+        The data can be any object supporting the buffer protocol, e.g. the
+        bytearray a decoder decodes into, and it should be equal to or
+        larger than width * height * 3. The data is not copied.
         """
-        image_array = numpy.fromstring(
-            image_string[:self.data_size], dtype=numpy.uint8)
+        image_array = numpy.frombuffer(
+            image_data, dtype=numpy.uint8, count=self.data_size)
 
         # We use PIL.Image to write the image and pygame to read it. To make
         # the two compliant, we must reshape, rotate, and flip the array/image.
@@ -0,0 +1,467 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+"""
+Metrics of coding sessions in the Prometheus text exposition format.
+
+A Registry holds counters, gauges and histograms and renders them in the
+text format read by Prometheus and other OpenMetrics scrapers, and
+start_http_server() serves the registry from a local HTTP endpoint.
+CodingMetrics defines the metrics of the transport examples: the payloads
+and bytes sent and received, the decode latency and redundancy of every
+generation, the rank progress of the generations being decoded and the
+active sessions. Its methods may be called from any thread.
+
+Usage:
+
+    import kodo_metrics
+
+    metrics = kodo_metrics.CodingMetrics()
+    kodo_metrics.start_http_server(metrics.registry, ('127.0.0.1', 9100))
+
+    # Sender
+    metrics.payload_sent(len(payload))
+
+    # Receiver
+    index = decoder.read_payload(payload)
+    metrics.payload_received(
+        len(payload), index, decoder.rank(index), decoder.generation(index)[2])
+
+The metrics are then available at http://127.0.0.1:9100/metrics.
+"""
+
+import bisect
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+import kodo_pacing
+
+# The content type of the text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    """Format a sample value, e.g. 3, 0.25 or +Inf."""
+    if value == float('inf'):
+        return '+Inf'
+    if value == float('-inf'):
+        return '-Inf'
+    if value != value:
+        return 'NaN'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(names, values):
+    """Format the labels of a sample, e.g. {role="sender"}."""
+    if not names:
+        return ''
+    labels = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace(
+            '"', '\\"').replace('\n', '\\n')
+        labels.append('{}="{}"'.format(name, value))
+    return '{' + ','.join(labels) + '}'
+
+
+class Metric(object):
+
+    """A metric with a value for every combination of its labels."""
+
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        """
+        Create Metric.
+
+        :param name: The name of the metric, e.g. kodo_payloads_sent_total.
+        :param documentation: The help text of the metric.
+        :param labels: The names of the labels of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def samples(self):
+        """Return the (name, label values, value) tuples of the metric."""
+        return [(self.name, labels, value)
+                for labels, value in sorted(self.values.items())]
+
+    def render(self):
+        """Return the metric in the text exposition format."""
+        lines = [
+            '# HELP {} {}'.format(self.name, self.documentation),
+            '# TYPE {} {}'.format(self.name, self.type)]
+        for name, labels, value in self.samples():
+            lines.append('{}{} {}'.format(
+                name, format_labels(self.labels_of(name), labels),
+                format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+    def labels_of(self, name):
+        """Return the label names of the samples with the given name."""
+        return self.labels
+
+    def check_labels(self, labels):
+        """Return the label values as a tuple, checking their number."""
+        if len(labels) != len(self.labels):
+            raise ValueError("Expected the labels {}.".format(self.labels))
+        return tuple(labels)
+
+
+class Counter(Metric):
+
+    """A value which only increases, e.g. the number of payloads sent."""
+
+    type = 'counter'
+
+    def inc(self, amount=1, labels=()):
+        """
+        Increase the counter.
+
+        :param amount: The non-negative amount to add.
+        :param labels: The values of the labels.
+        """
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        labels = self.check_labels(labels)
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        """Return the value of the counter."""
+        return self.values.get(tuple(labels), 0)
+
+
+class Gauge(Counter):
+
+    """A value which goes up and down, e.g. the number of active sessions."""
+
+    type = 'gauge'
+
+    def inc(self, amount=1, labels=()):
+        """Increase the gauge by an amount, which may be negative."""
+        labels = self.check_labels(labels)
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, amount=1, labels=()):
+        """Decrease the gauge by an amount."""
+        self.inc(-amount, labels)
+
+    def set(self, value, labels=()):
+        """Set the gauge to a value."""
+        self.values[self.check_labels(labels)] = value
+
+
+class Histogram(Metric):
+
+    """The distribution of observed values in cumulative buckets."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, buckets, labels=()):
+        """
+        Create Histogram.
+
+        :param name: The name of the metric.
+        :param documentation: The help text of the metric.
+        :param buckets: The upper bounds of the buckets. A bucket for all
+                        values, +Inf, is always added.
+        :param labels: The names of the labels of the metric.
+        """
+        super(Histogram, self).__init__(name, documentation, labels)
+        self.buckets = sorted(float(bound) for bound in buckets)
+        if not self.buckets or self.buckets[-1] != float('inf'):
+            self.buckets.append(float('inf'))
+
+    def observe(self, value, labels=()):
+        """
+        Add a value to the distribution.
+
+        :param value: The observed value.
+        :param labels: The values of the labels.
+        """
+        labels = self.check_labels(labels)
+        state = self.values.get(labels)
+        if state is None:
+            # The count of every bucket, the sum and the total count
+            state = self.values[labels] = [[0] * len(self.buckets), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def reset(self):
+        """Remove all observations."""
+        self.values = {}
+
+    def samples(self):
+        samples = []
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                samples.append((
+                    self.name + '_bucket', labels + (format_value(bound),),
+                    cumulative))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, count))
+        return samples
+
+    def labels_of(self, name):
+        if name.endswith('_bucket'):
+            return self.labels + ('le',)
+        return self.labels
+
+
+class Registry(object):
+
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        """Create Registry."""
+        self.metrics = []
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric to the registry and return it."""
+        if metric.name in [m.name for m in self.metrics]:
+            raise ValueError("Duplicate metric {}.".format(metric.name))
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        Add a function which updates metrics before they are rendered, e.g.
+        to compute a snapshot.
+        """
+        self.collectors.append(collector)
+
+    def counter(self, name, documentation, labels=()):
+        """Create and register a Counter."""
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        """Create and register a Gauge."""
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, buckets, labels=()):
+        """Create and register a Histogram."""
+        return self.register(
+            Histogram(name, documentation, buckets, labels))
+
+    def render(self):
+        """Return all metrics in the text exposition format."""
+        with self.lock:
+            for collector in self.collectors:
+                collector()
+            return ''.join(metric.render() for metric in self.metrics)
+
+
+class CodingMetrics(object):
+
+    """The metrics of the coding sessions of a process."""
+
+    # The buckets of the time from the first payload of a generation until
+    # it is decoded, in seconds
+    LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                       0.5, 1.0, 2.5, 5.0, 10.0]
+
+    # The buckets of the payloads received per symbol of a generation
+    REDUNDANCY_BUCKETS = [1.0, 1.05, 1.1, 1.2, 1.3, 1.5, 2.0, 3.0]
+
+    # The buckets of the fraction of the symbols received of a generation
+    PROGRESS_BUCKETS = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+
+    def __init__(self, registry=None, prefix='kodo',
+                 clock=kodo_pacing.monotonic):
+        """
+        Create CodingMetrics.
+
+        :param registry: The Registry of the metrics, or None to create one.
+        :param prefix: The prefix of the metric names.
+        :param clock: A function returning the current time in seconds.
+        """
+        self.registry = registry or Registry()
+        self.clock = clock
+
+        # The metrics are updated by the coding loop and rendered by the
+        # thread of the HTTP server, so every update holds the registry lock
+
+        r = self.registry
+        self.payloads_sent = r.counter(
+            prefix + '_payloads_sent_total', 'Payloads sent.')
+        self.bytes_sent = r.counter(
+            prefix + '_bytes_sent_total', 'Bytes of payloads sent.')
+        self.payloads_received = r.counter(
+            prefix + '_payloads_received_total', 'Payloads received.')
+        self.bytes_received = r.counter(
+            prefix + '_bytes_received_total', 'Bytes of payloads received.')
+        self.generations_decoded = r.counter(
+            prefix + '_generations_decoded_total', 'Generations decoded.')
+        self.decode_latency = r.histogram(
+            prefix + '_generation_decode_seconds',
+            'Time from the first payload of a generation until it is '
+            'decoded.', self.LATENCY_BUCKETS)
+        self.redundancy = r.histogram(
+            prefix + '_generation_redundancy_ratio',
+            'Payloads received per symbol of a decoded generation.',
+            self.REDUNDANCY_BUCKETS)
+        # A snapshot which goes up and down between scrapes, so it is a
+        # gauge per bucket rather than a histogram, whose buckets are
+        # counters
+        self.rank_progress = r.gauge(
+            prefix + '_generation_rank_progress',
+            'Generations being decoded with at most the fraction le of '
+            'their symbols received.', ['le'])
+        self.active_sessions = r.gauge(
+            prefix + '_active_sessions', 'Sessions in progress.', ['role'])
+        self.sessions = r.counter(
+            prefix + '_sessions_total', 'Sessions ended.', ['role', 'result'])
+
+        # The start time, received payloads and progress of the generations
+        # being decoded, and the generations decoded per session
+        self.__generations = {}
+        self.__decoded = {}
+        r.add_collector(self.__collect)
+
+    def payload_sent(self, size):
+        """
+        Count a payload sent.
+
+        :param size: The size of the payload in bytes.
+        """
+        with self.registry.lock:
+            self.payloads_sent.inc()
+            self.bytes_sent.inc(size)
+
+    def payload_received(self, size, index, rank, symbols, session=None):
+        """
+        Count a payload received and track the progress of its generation.
+
+        :param size: The size of the payload in bytes.
+        :param index: The index of the generation of the payload.
+        :param rank: The rank of the generation after the payload.
+        :param symbols: The number of symbols of the generation.
+        :param session: Any hashable value which identifies the object, if
+                        several objects are decoded.
+        """
+        with self.registry.lock:
+            self.payloads_received.inc()
+            self.bytes_received.inc(size)
+
+            decoded = self.__decoded.setdefault(session, set())
+            if index in decoded:
+                return
+
+            key = (session, index)
+            state = self.__generations.get(key)
+            if state is None:
+                state = self.__generations[key] = [self.clock(), 0, 0.0]
+            state[1] += 1
+            state[2] = float(rank) / symbols
+
+            if rank >= symbols:
+                del self.__generations[key]
+                decoded.add(index)
+                self.generations_decoded.inc()
+                self.decode_latency.observe(self.clock() - state[0])
+                self.redundancy.observe(float(state[1]) / symbols)
+
+    def session_opened(self, role):
+        """
+        Count a session which is started.
+
+        :param role: The role of this side of the session, e.g. 'sender' or
+                     'receiver'.
+        """
+        with self.registry.lock:
+            self.active_sessions.inc(labels=(role,))
+
+    def session_refused(self, role):
+        """
+        Count a session which is refused, e.g. since the server is full.
+
+        :param role: The role of this side of the session.
+        """
+        with self.registry.lock:
+            self.sessions.inc(labels=(role, 'refused'))
+
+    def session_closed(self, role, result, session=None):
+        """
+        Count a session which is ended and forget its generations.
+
+        :param role: The role of this side of the session.
+        :param result: The result of the session, e.g. 'completed',
+                       'failed' or 'evicted'.
+        :param session: The session, as given to payload_received().
+        """
+        with self.registry.lock:
+            self.active_sessions.dec(labels=(role,))
+            self.sessions.inc(labels=(role, result))
+
+            self.__decoded.pop(session, None)
+            for key in [key for key in self.__generations
+                        if key[0] == session]:
+                del self.__generations[key]
+
+    def __collect(self):
+        """
+        Compute the rank progress of the generations being decoded. It is
+        called by the registry with its lock held.
+        """
+        progress = [state[2] for state in self.__generations.values()]
+        for bound in self.PROGRESS_BUCKETS + [float('inf')]:
+            self.rank_progress.set(
+                sum(1 for value in progress if value <= bound),
+                labels=(format_value(bound),))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    """HTTP request handler which serves the registry of its server."""
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are periodic, so they are not logged
+        pass
+
+
+def start_http_server(registry, address=('127.0.0.1', 9100)):
+    """
+    Serve the metrics of a registry from a background thread.
+
+    :param registry: The Registry to serve.
+    :param address: The local (host, port) address. The default only
+                    accepts local connections.
+    :returns: The HTTPServer, which is stopped with shutdown().
+    """
+    server = HTTPServer(address, MetricsHandler)
+    server.registry = registry
+
+    thread = threading.Thread(
+        name='metrics', target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
@@ -0,0 +1,507 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+"""
+Encoding and decoding of objects larger than a single generation.
+
+An object is split into generations of at most max_symbols * max_symbol_size
+bytes, and each generation is coded by its own encoder/decoder built from
+the given factory. Every payload is prefixed with a header containing the
+index of its generation.
+
+Usage:
+
+    import kodo
+    import kodo_object
+
+    encoder_factory = kodo.FullVectorEncoderFactoryBinary8(64, 1400)
+    encoder = kodo_object.ObjectEncoder(encoder_factory, data)
+
+    decoder_factory = kodo.FullVectorDecoderFactoryBinary8(64, 1400)
+    decoder = kodo_object.ObjectDecoder(decoder_factory, len(data))
+
+    for payload in encoder.payloads(redundancy=10):
+        decoder.read_payload(payload)
+
+    assert decoder.is_complete()
+    data_out = decoder.output
+
+The size of the object must be known by the decoder, i.e. it must be
+communicated out of band.
+
+Files can be encoded and decoded through memory maps, so only the pages of
+the generations currently being coded need to be resident in memory:
+
+    encoder = kodo_object.ObjectEncoder.from_file(encoder_factory, path)
+    decoder = kodo_object.ObjectDecoder.to_file(
+        decoder_factory, output_path, object_size)
+    ...
+    decoder.close()
+"""
+
+import collections
+import math
+import mmap
+import os
+import struct
+import sys
+
+# The header prepended to every payload: the generation index
+HEADER = struct.Struct('!I')
+
+# Python 2 mmap objects do not support the buffer protocol of memoryview,
+# so files are read into memory instead of being mapped
+MAP_FILES = sys.version_info[0] >= 3
+
+
+def byte_view(data):
+    """
+    Return a flat memoryview of bytes over the given buffer.
+
+    :param data: Any object supporting the buffer protocol.
+    """
+    view = memoryview(data)
+    if view.ndim != 1 or view.itemsize != 1:
+        if hasattr(view, 'cast'):
+            view = view.cast('B')
+        else:
+            # Python 2 memoryviews cannot be cast, so the data is copied
+            view = memoryview(view.tobytes())
+    return view
+
+
+def partition(object_size, symbols, symbol_size):
+    """
+    Split an object into generations.
+
+    All generations contain the given number of symbols except the last
+    one, which only contains the symbols needed for the remaining bytes.
+
+    :param object_size: The size of the object in bytes.
+    :param symbols: The maximum number of symbols in a generation.
+    :param symbol_size: The size of a symbol in bytes.
+    :returns: A list of (offset, size, symbols) tuples, one per generation.
+    """
+    block_size = symbols * symbol_size
+    generations = []
+    for offset in range(0, object_size, block_size):
+        size = min(block_size, object_size - offset)
+        generations.append(
+            (offset, size, (size + symbol_size - 1) // symbol_size))
+    return generations
+
+
+def map_file(path, size=None):
+    """
+    Memory map a file.
+
+    :param path: The path of the file.
+    :param size: If given, the file is created or truncated to this size and
+                 mapped writable. Otherwise an existing file is mapped
+                 read-only.
+    :returns: The mmap object, or an empty bytearray for an empty file since
+              empty files cannot be mapped. On Python 2 the content of the
+              file is returned in a bytearray instead.
+    """
+    if size is None:
+        with open(path, 'rb') as f:
+            if not MAP_FILES:
+                return bytearray(f.read())
+            if os.fstat(f.fileno()).st_size == 0:
+                return bytearray()
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with open(path, 'w+b') as f:
+        f.truncate(size)
+        if not MAP_FILES:
+            return bytearray(size)
+        if size == 0:
+            return bytearray()
+        return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_WRITE)
+
+
+class CoderPool(object):
+
+    """
+    Pool of coders which are recycled instead of being rebuilt.
+
+    Building a coder allocates its symbol storage and coding matrix, so
+    coding many generations with freshly built coders spends much of its
+    time in the allocator. A released coder is instead reset with
+    factory.recycle() the next time a coder is acquired.
+    """
+
+    def __init__(self, factory, max_size=None):
+        """
+        Create CoderPool.
+
+        :param factory: The factory used to build and recycle the coders.
+        :param max_size: The maximum number of idle coders kept in the pool.
+                         No limit is applied if None.
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.__coders = []
+
+    def acquire(self, symbols=None):
+        """
+        Return a coder, recycling an idle one if possible.
+
+        :param symbols: The number of symbols of the coder. Defaults to the
+                        number of symbols of the factory.
+        """
+        default_symbols = self.factory.symbols()
+        if symbols is not None:
+            self.factory.set_symbols(symbols)
+        try:
+            if self.__coders:
+                coder = self.__coders.pop()
+                self.factory.recycle(coder)
+            else:
+                coder = self.factory.build()
+        finally:
+            self.factory.set_symbols(default_symbols)
+        return coder
+
+    def release(self, coder):
+        """
+        Return a coder to the pool.
+
+        The coder must not be used after it has been released.
+
+        :param coder: A coder acquired from this pool.
+        """
+        if self.max_size is None or len(self.__coders) < self.max_size:
+            self.__coders.append(coder)
+
+    def idle(self):
+        """Return the number of idle coders in the pool."""
+        return len(self.__coders)
+
+
+class ObjectEncoder(object):
+
+    """Encoder for an object which spans several generations."""
+
+    def __init__(self, factory, data, max_encoders=1):
+        """
+        Create ObjectEncoder.
+
+        :param factory: The encoder factory used to build the encoders.
+        :param data: The object to encode, any object supporting the buffer
+                     protocol.
+        :param max_encoders: The maximum number of encoders kept in memory.
+                             The encoder of a generation is rebuilt if it is
+                             needed again after being discarded. Discarded
+                             encoders are recycled for other generations.
+        """
+        self.factory = factory
+        self.pool = CoderPool(factory, max_size=1)
+        self.data = byte_view(data)
+        self.max_encoders = max_encoders
+        self.symbol_size = factory.symbol_size()
+        self.__generations = partition(
+            len(self.data), factory.symbols(), self.symbol_size)
+        self.__encoders = collections.OrderedDict()
+        self.__mapped_file = None
+
+    @classmethod
+    def from_file(cls, factory, path, max_encoders=1):
+        """
+        Create an ObjectEncoder which encodes a memory mapped file.
+
+        The symbols are read directly from the mapped pages, so the file is
+        never loaded into memory as a whole. On Python 2 the file is read
+        into memory instead.
+
+        :param factory: The encoder factory used to build the encoders.
+        :param path: The path of the file to encode.
+        :param max_encoders: The maximum number of encoders kept in memory.
+        """
+        mapped_file = map_file(path)
+        encoder = cls(factory, mapped_file, max_encoders)
+        encoder.__mapped_file = mapped_file
+        return encoder
+
+    def close(self):
+        """Discard the encoders and unmap the file, if any."""
+        self.__encoders.clear()
+        if hasattr(self.data, 'release'):
+            self.data.release()
+        if isinstance(self.__mapped_file, mmap.mmap):
+            self.__mapped_file.close()
+        self.__mapped_file = None
+
+    def generations(self):
+        """Return the number of generations."""
+        return len(self.__generations)
+
+    def generation(self, index):
+        """
+        Return the (offset, size, symbols) tuple describing a generation.
+
+        :param index: The index of the generation.
+        """
+        return self.__generations[index]
+
+    def payload_size(self):
+        """Return the maximum size of a payload including the header."""
+        return HEADER.size + self.factory.max_payload_size()
+
+    def encoder(self, index):
+        """
+        Return the encoder of a generation, building it if needed.
+
+        :param index: The index of the generation.
+        """
+        encoder = self.__encoders.pop(index, None)
+        if encoder is None:
+            encoder = self.build_encoder(index)
+
+        self.__encoders[index] = encoder
+        while len(self.__encoders) > self.max_encoders:
+            self.pool.release(self.__encoders.popitem(last=False)[1])
+
+        return encoder
+
+    def build_encoder(self, index):
+        """
+        Build a new encoder for a generation.
+
+        An encoder discarded by another generation is recycled if possible.
+
+        :param index: The index of the generation.
+        """
+        offset, size, symbols = self.__generations[index]
+        encoder = self.pool.acquire(symbols)
+
+        symbols_data = self.data[offset:offset + size]
+        if size < encoder.block_size():
+            # Pad the last generation to a whole number of symbols
+            padding = bytearray(encoder.block_size() - size)
+            symbols_data = symbols_data.tobytes() + bytes(padding)
+
+        encoder.set_const_symbols(symbols_data)
+        return encoder
+
+    def write_payload(self, index):
+        """
+        Encode a symbol of a generation.
+
+        :param index: The index of the generation.
+        :returns: The payload including the header.
+        """
+        return HEADER.pack(index) + self.encoder(index).write_payload()
+
+    def write_payload_into(self, buffer, index, offset=0):
+        """
+        Encode a symbol of a generation into a writable buffer.
+
+        :param buffer: The writable buffer, e.g. a bytearray.
+        :param index: The index of the generation.
+        :param offset: The offset in bytes where the payload is written.
+        :returns: The number of bytes written including the header.
+        """
+        encoder = self.encoder(index)
+        HEADER.pack_into(buffer, offset, index)
+        return HEADER.size + encoder.write_payload_into(
+            buffer, offset + HEADER.size)
+
+    def payloads(self, redundancy=0):
+        """
+        Generate the payloads for the whole object, one generation at a time.
+
+        :param redundancy: The amount of redundancy sent for each generation
+                           in percent of its symbols.
+        """
+        for index in range(self.generations()):
+            symbols = self.__generations[index][2]
+            count = int(math.ceil(symbols * (1 + redundancy / 100.0)))
+            for i in range(count):
+                yield self.write_payload(index)
+
+
+class ObjectDecoder(object):
+
+    """Decoder for an object which spans several generations."""
+
+    def __init__(self, factory, object_size, output=None, pool=None):
+        """
+        Create ObjectDecoder.
+
+        The decoders are built when the first payload of a generation
+        arrives, and they are recycled for the following generations as soon
+        as the generation is decoded and copied to the output.
+
+        :param factory: The decoder factory used to build the decoders.
+        :param object_size: The size of the object in bytes.
+        :param output: A writable buffer of at least object_size bytes where
+                       the decoded object is stored. If no buffer is given,
+                       a bytearray is created when the first generation is
+                       decoded, so no memory is spent on the object until
+                       then.
+        :param pool: The CoderPool of the factory, which may be shared by
+                     several object decoders. A new pool is created if no
+                     pool is given.
+        """
+        if output is None and object_size == 0:
+            output = bytearray()
+
+        self.factory = factory
+        self.pool = pool or CoderPool(factory)
+        self.object_size = object_size
+        self.output = output
+        self.__output = None
+        if output is not None:
+            self.__output = byte_view(output)
+            if len(self.__output) < object_size:
+                raise ValueError("The output buffer is too small.")
+
+        self.__generations = partition(
+            object_size, factory.symbols(), factory.symbol_size())
+        self.__decoders = {}
+        self.__complete = [False] * len(self.__generations)
+        self.__remaining = len(self.__generations)
+        self.__path = None
+
+    @classmethod
+    def to_file(cls, factory, path, object_size):
+        """
+        Create an ObjectDecoder which decodes into a memory mapped file.
+
+        The file is created (or truncated) with the size of the object, and
+        every decoded generation is copied straight into the mapped pages.
+        Call close() to flush and unmap the file. On Python 2 the object is
+        decoded in memory and written to the file by close().
+
+        :param factory: The decoder factory used to build the decoders.
+        :param path: The path of the output file.
+        :param object_size: The size of the object in bytes.
+        """
+        decoder = cls(factory, object_size, map_file(path, object_size))
+        decoder.__path = path
+        return decoder
+
+    def close(self):
+        """Recycle the decoders, and flush and unmap the output if mapped."""
+        for decoder in self.__decoders.values():
+            self.pool.release(decoder)
+        self.__decoders.clear()
+        if hasattr(self.__output, 'release'):
+            self.__output.release()
+        if isinstance(self.output, mmap.mmap):
+            self.output.flush()
+            self.output.close()
+        elif self.__path is not None and self.object_size > 0:
+            with open(self.__path, 'r+b') as f:
+                f.write(self.output)
+
+    def generations(self):
+        """Return the number of generations."""
+        return len(self.__generations)
+
+    def generation(self, index):
+        """
+        Return the (offset, size, symbols) tuple describing a generation.
+
+        :param index: The index of the generation.
+        """
+        return self.__generations[index]
+
+    def decoder(self, index):
+        """
+        Return the decoder of a generation, building it if needed.
+
+        :param index: The index of the generation.
+        :returns: The decoder or None if the generation is complete.
+        """
+        if self.__complete[index]:
+            return None
+
+        decoder = self.__decoders.get(index)
+        if decoder is None:
+            decoder = self.pool.acquire(self.__generations[index][2])
+            self.__decoders[index] = decoder
+        return decoder
+
+    def active_decoders(self):
+        """Return the number of decoders currently in memory."""
+        return len(self.__decoders)
+
+    def read_payload(self, payload, inplace=False):
+        """
+        Decode a payload produced by an ObjectEncoder.
+
+        By default the payload is left untouched. With inplace=True a
+        writable payload (e.g. a bytearray or a receive buffer) is used as
+        scratch space by the decoder, which saves a copy, and its content is
+        undefined afterwards.
+
+        :param payload: The payload including the header, any object
+                        supporting the buffer protocol.
+        :param inplace: True to decode a writable payload in place.
+        :returns: The index of the generation of the payload.
+        """
+        view = byte_view(payload)
+        index, = HEADER.unpack_from(view)
+        if index >= len(self.__generations):
+            raise ValueError("Invalid generation index {}.".format(index))
+
+        decoder = self.decoder(index)
+        if decoder is None:
+            return index
+
+        decoder.read_payload(view[HEADER.size:], inplace)
+        if decoder.is_complete():
+            self.complete_generation(index)
+
+        return index
+
+    def complete_generation(self, index):
+        """
+        Copy a decoded generation to the output and recycle its decoder.
+
+        :param index: The index of the generation.
+        """
+        offset, size, symbols = self.__generations[index]
+        decoder = self.__decoders.pop(index)
+        if self.__output is None:
+            self.output = bytearray(self.object_size)
+            self.__output = byte_view(self.output)
+        decoder.copy_from_symbols_into(self.__output[offset:offset + size])
+        self.pool.release(decoder)
+
+        self.__complete[index] = True
+        self.__remaining -= 1
+
+    def is_generation_complete(self, index):
+        """
+        Check whether a generation is decoded.
+
+        :param index: The index of the generation.
+        """
+        return self.__complete[index]
+
+    def rank(self, index):
+        """
+        Return the rank of a generation, i.e. the number of its symbols
+        which have been received.
+
+        :param index: The index of the generation.
+        """
+        if self.__complete[index]:
+            return self.__generations[index][2]
+
+        decoder = self.__decoders.get(index)
+        if decoder is None:
+            return 0
+        return decoder.rank()
+
+    def is_complete(self):
+        """Check whether the whole object is decoded."""
+        return self.__remaining == 0
@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+"""
+Rate control for the output of encoders.
+
+TokenBucket paces the packets of a sender to a configured bit rate, while
+allowing bursts of a configured size. The tokens are computed from a
+monotonic clock, and short waits are accumulated into a single sleep, since
+sleeping for each packet costs far more than the packet itself at high rates.
+
+Usage:
+
+    import kodo_pacing
+
+    bucket = kodo_pacing.TokenBucket(rate=100e6, burst=64 * 1400)
+
+    while True:
+        packet = encoder.write_payload()
+        bucket.wait(len(packet))
+        sock.sendto(packet, address)
+
+In an asyncio coroutine the delay is awaited instead:
+
+    delay = bucket.consume(len(packet))
+    if delay >= bucket.min_sleep:
+        await asyncio.sleep(delay)
+"""
+
+import time
+
+# A monotonic clock where available (Python 3.3 and later)
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class TokenBucket(object):
+
+    """Token bucket which limits the rate of a sender."""
+
+    def __init__(self, rate, burst, min_sleep=0.001, clock=monotonic):
+        """
+        Create TokenBucket.
+
+        :param rate: The rate in bits per second.
+        :param burst: The size of the bucket in bytes, i.e. the number of
+                      bytes which may be sent back to back after an idle
+                      period.
+        :param min_sleep: The shortest sleep in seconds. Smaller delays are
+                          accumulated until they reach this duration.
+        :param clock: A function returning the current time in seconds.
+        """
+        if rate <= 0:
+            raise ValueError("The rate must be positive.")
+
+        self.rate = float(rate)
+        self.burst = burst
+        self.min_sleep = min_sleep
+        self.clock = clock
+        self.__tokens = float(burst)
+        self.__time = clock()
+
+    def tokens(self):
+        """
+        Return the number of available tokens in bytes.
+
+        The number is negative if the sender is ahead of the rate.
+        """
+        self.__refill()
+        return self.__tokens
+
+    def consume(self, size):
+        """
+        Take the tokens for a packet.
+
+        The packet is accounted for right away, so the caller must send the
+        packet after the returned delay.
+
+        :param size: The size of the packet in bytes.
+        :returns: The delay in seconds before the packet may be sent.
+        """
+        self.__refill()
+        self.__tokens -= size
+        if self.__tokens >= 0:
+            return 0.0
+        return -self.__tokens * 8.0 / self.rate
+
+    def wait(self, size):
+        """
+        Take the tokens for a packet, sleeping if the sender is ahead.
+
+        :param size: The size of the packet in bytes.
+        :returns: The delay in seconds, which is only slept once it reaches
+                  min_sleep.
+        """
+        delay = self.consume(size)
+        if delay >= self.min_sleep:
+            time.sleep(delay)
+        return delay
+
+    def __refill(self):
+        now = self.clock()
+        self.__tokens = min(
+            self.burst,
+            self.__tokens + (now - self.__time) * self.rate / 8.0)
+        self.__time = now
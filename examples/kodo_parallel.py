@@ -0,0 +1,339 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+"""
+Parallel coding of objects spanning several generations.
+
+The generations of an object are sharded across a pool of worker threads.
+The coders release the GIL while encoding and decoding, so the workers run
+in parallel on separate cores. Each worker builds its own factory from the
+shared configuration, i.e. the factory type, the number of symbols and the
+symbol size.
+
+Usage:
+
+    import kodo
+    import kodo_parallel
+
+    encoder = kodo_parallel.ParallelObjectEncoder(
+        kodo.FullVectorEncoderFactoryBinary8, 64, 1400, data, workers=4)
+
+    for payload in encoder.payloads():
+        send(payload)
+
+    decoder = kodo_parallel.ParallelObjectDecoder(
+        kodo.FullVectorDecoderFactoryBinary8, 64, 1400, object_size,
+        output=open(path, 'wb'), workers=4)
+
+    while not decoder.is_complete():
+        decoder.read_payload(receive())
+    decoder.close()
+
+The payloads are compatible with kodo_object.ObjectEncoder and
+kodo_object.ObjectDecoder.
+"""
+
+import math
+import multiprocessing
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import kodo_object
+
+
+class ParallelObjectEncoder(object):
+
+    """Encoder which shards the generations of an object across workers."""
+
+    def __init__(self, factory_type, max_symbols, max_symbol_size, data,
+                 workers=None, redundancy=0, queue_size=2):
+        """
+        Create ParallelObjectEncoder.
+
+        :param factory_type: The encoder factory type, e.g.
+                             kodo.FullVectorEncoderFactoryBinary8.
+        :param max_symbols: The number of symbols in a generation.
+        :param max_symbol_size: The size of a symbol in bytes.
+        :param data: The object to encode, any object supporting the buffer
+                     protocol.
+        :param workers: The number of worker threads. Defaults to the number
+                        of CPUs.
+        :param redundancy: The amount of redundancy sent for each generation
+                           in percent of its symbols.
+        :param queue_size: The number of generations each worker may encode
+                           ahead of the output, which bounds the memory use.
+        """
+        self.factory_type = factory_type
+        self.max_symbols = max_symbols
+        self.max_symbol_size = max_symbol_size
+        self.data = kodo_object.byte_view(data)
+        self.workers = workers or multiprocessing.cpu_count()
+        self.redundancy = redundancy
+        self.queue_size = queue_size
+
+        self.__generations = kodo_object.partition(
+            len(self.data), max_symbols, max_symbol_size)
+
+    def generations(self):
+        """Return the number of generations."""
+        return len(self.__generations)
+
+    def payloads(self):
+        """
+        Generate the payloads for the whole object.
+
+        The payloads of the generations encoded by the different workers are
+        interleaved into a single stream.
+        """
+        stop = threading.Event()
+        queues = [queue.Queue(self.queue_size) for i in range(self.workers)]
+        threads = [
+            threading.Thread(
+                target=self.__encode, args=(worker, queues[worker], stop))
+            for worker in range(self.workers)]
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            active = list(queues)
+            while active:
+                # Take the next generation from each worker and interleave
+                # their payloads
+                chunks = []
+                for worker_queue in list(active):
+                    chunk = worker_queue.get()
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    if chunk is None:
+                        active.remove(worker_queue)
+                    else:
+                        chunks.append(chunk)
+
+                for i in range(max([len(c) for c in chunks] or [0])):
+                    for chunk in chunks:
+                        if i < len(chunk):
+                            yield chunk[i]
+        finally:
+            stop.set()
+
+    def __encode(self, worker, output, stop):
+        """Encode the generations assigned to a worker."""
+        try:
+            factory = self.factory_type(
+                self.max_symbols, self.max_symbol_size)
+            encoder = kodo_object.ObjectEncoder(factory, self.data)
+
+            for index in range(worker, self.generations(), self.workers):
+                symbols = self.__generations[index][2]
+                count = int(math.ceil(
+                    symbols * (1 + self.redundancy / 100.0)))
+
+                # Encode the whole generation in a single native call
+                payloads, lengths = \
+                    encoder.encoder(index).write_payloads(count)
+                header = kodo_object.HEADER.pack(index)
+                view = memoryview(payloads)
+
+                chunk = []
+                offset = 0
+                for length in lengths:
+                    chunk.append(header + view[offset:offset + length])
+                    offset += length
+
+                if not _put(output, chunk, stop):
+                    return
+            _put(output, None, stop)
+        except Exception as e:
+            _put(output, e, stop)
+
+
+class ParallelObjectDecoder(object):
+
+    """Decoder which routes the generations of an object to workers."""
+
+    def __init__(self, factory_type, max_symbols, max_symbol_size,
+                 object_size, output, workers=None, queue_size=64):
+        """
+        Create ParallelObjectDecoder.
+
+        Generation i is decoded by worker i % workers, which owns the
+        decoders of all its generations. The decoded generations are written
+        to the output in order, so generations completed ahead of an
+        incomplete one are kept in memory until they can be written.
+
+        :param factory_type: The decoder factory type, e.g.
+                             kodo.FullVectorDecoderFactoryBinary8.
+        :param max_symbols: The number of symbols in a generation.
+        :param max_symbol_size: The size of a symbol in bytes.
+        :param object_size: The size of the object in bytes.
+        :param output: A file-like object with a write() method, e.g. a file
+                       opened for writing or an io.BytesIO.
+        :param workers: The number of worker threads. Defaults to the number
+                        of CPUs.
+        :param queue_size: The number of payloads which may be queued for
+                           each worker before read_payload() blocks.
+        """
+        self.factory_type = factory_type
+        self.max_symbols = max_symbols
+        self.max_symbol_size = max_symbol_size
+        self.object_size = object_size
+        self.output = output
+        self.workers = workers or multiprocessing.cpu_count()
+
+        self.__generations = kodo_object.partition(
+            object_size, max_symbols, max_symbol_size)
+        self.__complete = [False] * len(self.__generations)
+        self.__pending = {}
+        self.__written = 0
+        self.__error = None
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__done = threading.Event()
+        if not self.__generations:
+            self.__done.set()
+
+        self.__queues = [queue.Queue(queue_size) for i in range(self.workers)]
+        self.__threads = [
+            threading.Thread(target=self.__decode, args=(worker_queue,))
+            for worker_queue in self.__queues]
+
+        for thread in self.__threads:
+            thread.daemon = True
+            thread.start()
+
+    def generations(self):
+        """Return the number of generations."""
+        return len(self.__generations)
+
+    def read_payload(self, payload):
+        """
+        Pass a payload produced by an object encoder to its worker.
+
+        The payload is copied, so the buffer can be reused right away and is
+        never modified. The worker decodes its copy in place.
+
+        :param payload: The payload including the header, any object
+                        supporting the buffer protocol.
+        :returns: The index of the generation of the payload.
+        """
+        self.__check_error()
+
+        index, = kodo_object.HEADER.unpack_from(payload)
+        if index >= len(self.__generations):
+            raise ValueError("Invalid generation index {}.".format(index))
+
+        if not self.__complete[index]:
+            worker_queue = self.__queues[index % self.workers]
+            if not _put(worker_queue, bytearray(payload), self.__stop):
+                self.__check_error()
+                raise RuntimeError("The decoder is closed.")
+
+        return index
+
+    def is_generation_complete(self, index):
+        """
+        Check whether a generation is decoded.
+
+        :param index: The index of the generation.
+        """
+        return self.__complete[index]
+
+    def is_complete(self):
+        """Check whether the whole object is decoded and written."""
+        return self.__done.is_set() and self.__error is None
+
+    def wait(self, timeout=None):
+        """
+        Wait until the whole object is decoded and written.
+
+        :param timeout: The maximum time to wait in seconds.
+        :returns: True if the object is complete.
+        """
+        self.__done.wait(timeout)
+        self.__check_error()
+        return self.is_complete()
+
+    def close(self):
+        """Stop the workers and discard their decoders."""
+        self.__stop.set()
+        for thread in self.__threads:
+            thread.join()
+
+    def __check_error(self):
+        if self.__error is not None:
+            raise self.__error
+
+    def __decode(self, worker_queue):
+        """Decode the payloads of the generations owned by a worker."""
+        try:
+            factory = self.factory_type(
+                self.max_symbols, self.max_symbol_size)
+            pool = kodo_object.CoderPool(factory)
+            decoders = {}
+
+            while not self.__stop.is_set():
+                try:
+                    payload = worker_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+                index, = kodo_object.HEADER.unpack_from(payload)
+                if self.__complete[index]:
+                    continue
+
+                offset, size, symbols = self.__generations[index]
+                decoder = decoders.get(index)
+                if decoder is None:
+                    decoder = pool.acquire(symbols)
+                    decoders[index] = decoder
+
+                decoder.read_payload(
+                    memoryview(payload)[kodo_object.HEADER.size:],
+                    inplace=True)
+
+                if decoder.is_complete():
+                    del decoders[index]
+                    self.__complete[index] = True
+                    self.__deliver(index, decoder.copy_from_symbols()[:size])
+                    pool.release(decoder)
+        except Exception as e:
+            self.__error = e
+            self.__stop.set()
+            self.__done.set()
+
+    def __deliver(self, index, data):
+        """Write the decoded generations to the output in order."""
+        with self.__lock:
+            self.__pending[index] = data
+            while self.__written in self.__pending:
+                self.output.write(self.__pending.pop(self.__written))
+                self.__written += 1
+
+            if self.__written == len(self.__generations):
+                self.__done.set()
+
+
+def _put(output, item, stop):
+    """
+    Put an item on a bounded queue unless the consumer has stopped.
+
+    :returns: True if the item was put on the queue.
+    """
+    while not stop.is_set():
+        try:
+            output.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
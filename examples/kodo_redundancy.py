@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+"""
+Adaptive redundancy driven by receiver feedback.
+
+RedundancyController estimates the packet loss rate from the reports of a
+receiver, i.e. how many payloads of a generation were received out of those
+sent, and computes how many coded payloads to send for the symbols which are
+still missing at the receiver, e.g. decoder.symbols() - decoder.rank().
+
+Usage:
+
+    import kodo_redundancy
+
+    controller = kodo_redundancy.RedundancyController()
+
+    # Send the first round of a generation
+    count = controller.payloads(symbols)
+
+    # When the receiver reports the rank of the generation
+    controller.report(sent, received)
+    count = controller.payloads(symbols - rank)
+"""
+
+import math
+
+
+class RedundancyController(object):
+
+    """Estimates the loss rate and the payloads needed to complete."""
+
+    def __init__(self, loss=0.1, smoothing=0.25, confidence=2.0,
+                 overhead=1, max_loss=0.9):
+        """
+        Create RedundancyController.
+
+        :param loss: The initial estimate of the loss rate, between 0 and 1.
+        :param smoothing: The weight of a new report in the moving average
+                          of the loss rate.
+        :param confidence: The number of standard deviations of the loss
+                           covered by the computed number of payloads. Higher
+                           values trade bandwidth for fewer feedback rounds.
+        :param overhead: The number of extra payloads sent to cover linearly
+                         dependent payloads, e.g. more for the binary field.
+        :param max_loss: The upper bound of the estimated loss rate.
+        """
+        self.loss = loss
+        self.smoothing = smoothing
+        self.confidence = confidence
+        self.overhead = overhead
+        self.max_loss = max_loss
+        self.reports = 0
+
+    def report(self, sent, received):
+        """
+        Update the loss estimate with a report from the receiver.
+
+        :param sent: The number of payloads sent since the last report.
+        :param received: The number of those payloads which were received.
+        """
+        if sent <= 0:
+            return
+
+        sample = 1.0 - min(float(received) / sent, 1.0)
+        self.loss += self.smoothing * (sample - self.loss)
+        self.loss = min(max(self.loss, 0.0), self.max_loss)
+        self.reports += 1
+
+    def payloads(self, missing):
+        """
+        Return the number of payloads to send for the missing symbols.
+
+        The number of received payloads out of n sent is binomial, so n is
+        the smallest number for which the expected number of received
+        payloads, less the given number of standard deviations, covers the
+        missing symbols and the overhead.
+
+        :param missing: The number of symbols missing at the receiver.
+        """
+        if missing <= 0:
+            return 0
+
+        p = self.loss
+        a = 1.0 - p
+        b = self.confidence * math.sqrt(p * (1.0 - p))
+        m = missing + self.overhead
+
+        # Solve a * n - b * sqrt(n) = m for sqrt(n)
+        root = (b + math.sqrt(b * b + 4.0 * a * m)) / (2.0 * a)
+        return int(math.ceil(root * root))
+
+    def redundancy(self, symbols):
+        """
+        Return the redundancy for a whole generation in percent.
+
+        :param symbols: The number of symbols in the generation.
+        """
+        return 100.0 * (self.payloads(symbols) - symbols) / symbols
@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+"""
+In-order delivery of the symbols of a decoder.
+
+OnTheFly and SlidingWindow decoders decode symbols before the block is
+complete. in_order_symbols reads payloads into such a decoder and yields
+each symbol as soon as it and all the symbols before it are decoded, so a
+live stream can be forwarded without waiting for is_complete().
+
+Usage:
+
+    import kodo_stream
+
+    for index, symbol in kodo_stream.in_order_symbols(decoder, payloads):
+        output.write(symbol)
+"""
+
+
+def in_order_symbols(decoder, payloads):
+    """
+    Decode payloads and yield the decoded symbols in order.
+
+    The symbols are yielded as (index, symbol) tuples, where symbol is a
+    read-only memoryview of the decoder memory. The generator stops when
+    every symbol of the decoder has been yielded, or when the payloads are
+    exhausted.
+
+    :param decoder: The decoder, which must support take_decoded().
+    :param payloads: An iterable of payloads, e.g. the packets received from
+        a socket.
+    """
+    decoded = set()
+    next_index = 0
+    payloads = iter(payloads)
+
+    while True:
+        decoded.update(decoder.take_decoded())
+        while next_index in decoded:
+            decoded.remove(next_index)
+            yield next_index, decoder.symbol_view(next_index)
+            next_index += 1
+
+        # Stop before reading another payload, which may block
+        if next_index == decoder.symbols():
+            return
+
+        payload = next(payloads, None)
+        if payload is None:
+            return
+        decoder.read_payload(payload)
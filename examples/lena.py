@@ -91,16 +91,12 @@ def main():
         max_symbol_size=symbol_size)
     decoder = decoder_factory.build()
 
-    # Connect the tracing callback to the decode state viewer
-    def encoding_callback(zone, msg):
-        encoding_state_viewer.trace_callback(zone, msg)
-
-    encoder.set_trace_callback(encoding_callback)
-
-    def decoding_callback(zone, msg):
-        decoding_state_viewer.trace_callback(zone, msg)
-
-    decoder.set_trace_callback(decoding_callback)
+    # Connect the trace events to the state viewers, only the zones used by
+    # the viewers are passed on to Python
+    encoder.set_trace_events(
+        encoding_state_viewer.trace_callback, encoding_state_viewer.zones)
+    decoder.set_trace_events(
+        decoding_state_viewer.trace_callback, decoding_state_viewer.zones)
 
     # Create a byte array from the image to use in the encoding (only pick the
     # data we have room for).
@@ -109,6 +105,14 @@ def main():
     # Set the converted image data
     encoder.set_const_symbols(data_in)
 
+    # Decode directly into a bytearray, which the image viewer can show
+    # without copying the symbols out of the decoder for every packet. The
+    # symbols are copied if the decoder cannot decode into the bytearray.
+    data_out = bytearray(decoder.block_size())
+    mutable = hasattr(decoder, 'set_mutable_symbols')
+    if mutable:
+        decoder.set_mutable_symbols(data_out)
+
     # Create an image viwer and run the following code in a try catch;
     # this prevents the program from locking up, as the finally clause will
     # close down the image viewer.
@@ -121,10 +125,9 @@ def main():
             if random.choice([True, False]):
                 decoder.read_payload(packet)
 
-            image_viewer.set_image(decoder.copy_from_symbols())
-
-        # The decoder is complete, now copy the symbols from the decoder
-        data_out = decoder.copy_from_symbols()
+            if not mutable:
+                decoder.copy_from_symbols_into(data_out)
+            image_viewer.set_image(data_out)
 
         # Let the user see the photo before closing the application
         for i in range(100):
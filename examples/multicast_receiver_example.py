@@ -8,10 +8,10 @@
 
 import argparse
 import kodo
+import kodo_object
 import socket
 import struct
 import sys
-import time
 
 MCAST_GRP = '224.1.1.1'
 MCAST_PORT = 5007
@@ -30,6 +30,12 @@ def main():
         help='Path to the file which should be received.',
         default='output_file')
 
+    parser.add_argument(
+        '--file-size',
+        type=int,
+        help='Size of the file which should be received, in bytes.',
+        default=None)
+
     parser.add_argument(
         '--ip',
         type=str,
@@ -60,8 +66,6 @@ def main():
         max_symbols=symbols,
         max_symbol_size=symbol_size)
 
-    decoder = decoder_factory.build()
-
     sock = socket.socket(
         family=socket.AF_INET,
         type=socket.SOCK_DGRAM,
@@ -77,19 +81,32 @@ def main():
     if args.dry_run:
         sys.exit(0)
 
+    if args.file_size is None:
+        print("The --file-size printed by the sender is required.")
+        sys.exit(1)
+
+    # The decoded generations are written straight into the memory mapped
+    # output file
+    decoder = kodo_object.ObjectDecoder.to_file(
+        decoder_factory, args.output_file, args.file_size)
+
     print("Processing...")
+    # Receive as fast as the packets arrive, the sender paces them to its
+    # --rate and packets are lost if the socket buffer overflows
     while not decoder.is_complete():
-        time.sleep(0.2)
         packet = sock.recv(10240)
 
-        decoder.read_payload(packet)
+        index = decoder.read_payload(packet)
         print("Packet received!")
-        print("Decoder rank: {}/{}".format(decoder.rank(), decoder.symbols()))
-
-    # Write the decoded data to the output file
-    f = open(args.output_file, 'wb')
-    f.write(decoder.copy_from_symbols())
-    f.close()
+        if decoder.is_generation_complete(index):
+            print("Generation {} complete".format(index))
+        else:
+            generation_decoder = decoder.decoder(index)
+            print("Generation {} rank: {}/{}".format(
+                index, generation_decoder.rank(),
+                generation_decoder.symbols()))
+
+    decoder.close()
 
     print("Processing finished.")
 
@@ -8,10 +8,11 @@
 
 import argparse
 import kodo
+import kodo_object
+import kodo_pacing
 import os
 import socket
 import sys
-import time
 
 MCAST_GRP = '224.1.1.1'
 MCAST_PORT = 5007
@@ -38,6 +39,12 @@ def main():
         help='The port to send to.',
         default=MCAST_PORT)
 
+    parser.add_argument(
+        '--rate',
+        type=float,
+        help='The rate to send at, in bits per second.',
+        default=1000000)
+
     parser.add_argument(
         '--dry-run',
         action='store_true',
@@ -61,8 +68,6 @@ def main():
         max_symbols=symbols,
         max_symbol_size=symbol_size)
 
-    encoder = encoder_factory.build()
-
     sock = socket.socket(
         family=socket.AF_INET,
         type=socket.SOCK_DGRAM,
@@ -70,28 +75,90 @@ def main():
 
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
 
-    # Get the data to encode.
-    f = open(os.path.expanduser(args.file_path), 'rb')
-    data_in = f.read()
-    f.close()
+    if args.dry_run:
+        # Decode the file locally, split into several small generations
+        dry_run(os.path.expanduser(args.file_path))
+        return
+
+    # Map the file into memory, so the symbols are read directly from the
+    # file and it is never loaded into memory as a whole. Files larger than
+    # a single block are split into several generations.
+    encoder = file_encoder(encoder_factory, os.path.expanduser(args.file_path))
 
-    # Assign the data buffer to the encoder so that we can
-    # produce encoded symbols
-    encoder.set_const_symbols(data_in)
+    print("File size: {} bytes (use --file-size {} on the receiver)".format(
+        len(encoder.data), len(encoder.data)))
 
     address = (args.ip, args.port)
 
-    print("Processing")
-    while True and not args.dry_run:
-        time.sleep(0.2)
-        # Generate an encoded packet
-        packet = encoder.write_payload()
-        print("Packet encoded!")
+    # Pace the packets to the rate, allowing bursts of a few packets
+    bucket = kodo_pacing.TokenBucket(args.rate, 8 * encoder.payload_size())
 
-        # Send the packet.
+    print("Processing")
+    for packet in packets(encoder):
+        # Send the packet when the rate allows it.
+        bucket.wait(len(packet))
         sock.sendto(packet, address)
 
+    encoder.close()
     print("Processing finished")
 
+
+def file_encoder(encoder_factory, path):
+    """
+    Return an ObjectEncoder for a memory mapped file.
+
+    The packets cycle through the generations, so the encoders of all
+    generations are kept. Otherwise every packet would rebuild the encoder
+    of its generation and restart its systematic phase. The encoders read
+    the symbols from the mapped pages, so only the state of the encoders
+    is kept in memory.
+
+    :param encoder_factory: The encoder factory.
+    :param path: The path of the file.
+    """
+    encoder = kodo_object.ObjectEncoder.from_file(encoder_factory, path)
+    encoder.max_encoders = max(encoder.generations(), 1)
+    return encoder
+
+
+def packets(encoder):
+    """
+    Generate encoded packets forever, cycling through the generations.
+
+    :param encoder: The ObjectEncoder.
+    """
+    index = 0
+    while encoder.generations() > 0:
+        yield encoder.write_payload(index)
+        index = (index + 1) % encoder.generations()
+
+
+def dry_run(path):
+    """
+    Check that a file of several generations is decoded from the packets.
+
+    :param path: The path of the file.
+    """
+    symbols = 8
+    symbol_size = 100
+    encoder = file_encoder(
+        kodo.FullVectorEncoderFactoryBinary(symbols, symbol_size), path)
+    size = len(encoder.data)
+    assert encoder.generations() > 1
+
+    decoder = kodo_object.ObjectDecoder(
+        kodo.FullVectorDecoderFactoryBinary(symbols, symbol_size), size)
+    # Without loss a few rounds of the generations are plenty
+    limit = 4 * symbols * encoder.generations()
+    for count, packet in enumerate(packets(encoder)):
+        decoder.read_payload(packet)
+        if decoder.is_complete() or count == limit:
+            break
+
+    with open(path, 'rb') as f:
+        assert decoder.output == f.read()
+    decoder.close()
+    encoder.close()
+
 if __name__ == "__main__":
     main()
@@ -58,13 +58,10 @@ def main():
         # Just for fun - fill the input data with random data
         data_in = os.urandom(encoder.block_size())
 
-        def decoder_callback(zone, msg):
-            decoder_viewer.trace_callback(zone, msg)
-        decoder.set_trace_callback(decoder_callback)
-
-        def encoder_callback(zone, msg):
-            encoder_viewer.trace_callback(zone, msg)
-        encoder.set_trace_callback(encoder_callback)
+        decoder.set_trace_events(
+            decoder_viewer.trace_callback, decoder_viewer.zones)
+        encoder.set_trace_events(
+            encoder_viewer.trace_callback, encoder_viewer.zones)
 
         # Assign the data buffer to the encoder so that we may start
         # to produce encoded symbols from it
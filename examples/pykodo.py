@@ -36,9 +36,15 @@ Usage:
         max_symbol_size=symbol_size)
     decoder = decoder_factory.build()
 
+The stacks are built without tracing, unless trace=True is passed to
+encoder_factory or decoder_factory.
 """
 
 
+# The suffix of the names of the stacks built without tracing
+NO_TRACE = 'NoTrace'
+
+
 def nested_add(dictionary, keys, value):
     current_dict = dictionary
     for key in keys:
@@ -81,7 +87,13 @@ def __get_stacks():
         if stack.startswith('__'):
             continue
 
-        stack_pieces = split_upper_case(stack)
+        # Every stack is available with and without tracing
+        name = stack
+        trace = not name.endswith(NO_TRACE)
+        if not trace:
+            name = name[:-len(NO_TRACE)]
+
+        stack_pieces = split_upper_case(name)
 
         # NoCode does not have a field
         field = None
@@ -104,7 +116,7 @@ def __get_stacks():
         if field is not None:
             location += [field]
 
-        location += [coder_type]
+        location += [coder_type, trace]
 
         nested_add(
             kodo_stacks,
@@ -124,11 +136,11 @@ for field in fields:
 
 
 def __create_factory(algorithm, coder_type, max_symbols,
-                     max_symbol_size, field=None):
+                     max_symbol_size, field=None, trace=False):
     location = [algorithm]
     if field is not None:
         location += [field]
-    location += [coder_type]
+    location += [coder_type, trace]
 
     return nested_get(__kodo_stacks, location)(max_symbols, max_symbol_size)
 
@@ -145,6 +157,8 @@ def decoder_factory(**kwargs):
                             decoders.
         :param max_symbol_size: The maximum size of the symbols for the
                                 factory's decoders.
+        :param trace: True for a stack with tracing, which is slower. By
+                      default the stack is built without tracing.
     """
     return __create_factory(coder_type="decoder", **kwargs)
 
@@ -161,5 +175,27 @@ def encoder_factory(**kwargs):
                             encoders.
         :param max_symbol_size: The maximum size of the symbols for the
                                 factory's encoders.
+        :param trace: True for a stack with tracing, which is slower. By
+                      default the stack is built without tracing.
     """
     return __create_factory(coder_type="encoder", **kwargs)
+
+
+def stacks(coder_type):
+    """
+    Return the available stacks of a coder type.
+
+        :param coder_type: The coder type, i.e. "encoder" or "decoder".
+        :returns: A list of (algorithm, field) tuples. The field is None for
+                  stacks without a field.
+    """
+    result = []
+    for algorithm in algorithms:
+        coders = __kodo_stacks.get(algorithm, {})
+        if coder_type in coders:
+            result.append((algorithm, None))
+            continue
+        for field in fields:
+            if coder_type in coders.get(field, {}):
+                result.append((algorithm, field))
+    return result
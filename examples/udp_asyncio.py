@@ -0,0 +1,255 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+import argparse
+import asyncio
+import os
+import time
+
+import kodo
+import kodo_asyncio
+import kodo_metrics
+import kodo_object
+import kodo_redundancy
+
+
+def main():
+    """
+    Asynchronous UDP sender and receiver.
+
+    A number of objects are transferred concurrently on a single event loop,
+    each to its own port starting at the given port. With --multiplex the
+    transfers are sent as sessions to a server on a single port. Requires
+    Python 3.7 or later.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Run without network use, for testing purposes')
+
+    parser.add_argument(
+        '--ip',
+        type=str,
+        help='ip of the receiver.',
+        default='127.0.0.1')
+
+    parser.add_argument(
+        '--port',
+        type=int,
+        help='first data port on the receiver.',
+        default=41011)
+
+    parser.add_argument(
+        '--transfers',
+        type=int,
+        help='number of concurrent transfers.',
+        default=1)
+
+    parser.add_argument(
+        '--size',
+        type=int,
+        help='size of each object, in bytes.',
+        default=1000000)
+
+    parser.add_argument(
+        '--symbols',
+        type=int,
+        help='number of symbols in each generation/block.',
+        default=64)
+
+    parser.add_argument(
+        '--symbol-size',
+        type=int,
+        help='size of each symbol, in bytes.',
+        default=1400)
+
+    parser.add_argument(
+        '--rate',
+        type=float,
+        help='maximum rate of each transfer, in bits per second.',
+        default=None)
+
+    parser.add_argument(
+        '--max-redundancy',
+        type=float,
+        help='maximum amount of redundancy to be sent, in percent.',
+        default=200)
+
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        help='timeout used by the receiver, in seconds.',
+        default=2)
+
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='adapt the redundancy to the loss reported by the receiver.')
+
+    parser.add_argument(
+        '--multiplex',
+        action='store_true',
+        help='send the transfers as sessions to a server on one port.')
+
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='serve the metrics over HTTP on this local port.')
+
+    parser.add_argument(
+        'role',
+        choices=['sender', 'receiver', 'server'],
+        nargs='?',
+        help='the role of this node.')
+
+    args = parser.parse_args()
+
+    if args.dry_run:
+        # Transfer an object directly and through a server on the loopback
+        # interface
+        asyncio.get_event_loop().run_until_complete(dry_run(args))
+        return
+
+    if args.role is None:
+        parser.error("the role is required")
+
+    args.metrics = None
+    if args.metrics_port is not None:
+        args.metrics = kodo_metrics.CodingMetrics()
+        kodo_metrics.start_http_server(
+            args.metrics.registry, ('127.0.0.1', args.metrics_port))
+        print("Metrics at http://127.0.0.1:{}/metrics".format(
+            args.metrics_port))
+
+    start = time.time()
+    loop = asyncio.get_event_loop()
+    if args.role == 'server':
+        server = loop.run_until_complete(serve(args))
+        print("Completed {} sessions in {:.2f}s, {} evicted.".format(
+            server.completed, time.time() - start, server.evicted))
+        return
+    elif args.role == 'sender':
+        protocols = loop.run_until_complete(send(args))
+        print("Sent {} packets in {:.2f}s.".format(
+            sum([p.sent for p in protocols]), time.time() - start))
+    else:
+        protocols = loop.run_until_complete(receive(args))
+        print("Received {} packets in {:.2f}s.".format(
+            sum([p.received for p in protocols]), time.time() - start))
+
+    completed = [p.done.result() for p in protocols].count(True)
+    print("{} of {} transfers completed.".format(completed, len(protocols)))
+
+
+async def dry_run(args):
+    """Transfer a small object to a receiver and to a server locally."""
+    loop = asyncio.get_event_loop()
+    size = 100000
+    data = os.urandom(size)
+    encoder_factory = kodo.FullVectorEncoderFactoryBinary8(16, 1000)
+    decoder_factory = kodo.FullVectorDecoderFactoryBinary8(16, 1000)
+
+    # The event loop reads a single datagram of each transport per
+    # iteration, so the encoders yield after every payload to avoid
+    # overflowing the socket buffer of the decoder on the same loop
+    decoder = kodo_object.ObjectDecoder(decoder_factory, size)
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: kodo_asyncio.DecoderProtocol(
+            decoder, timeout=args.timeout, linger=0),
+        local_addr=('127.0.0.1', 0))
+    address = transport.get_extra_info('sockname')
+    encoder = kodo_object.ObjectEncoder(encoder_factory, data)
+    sender = await kodo_asyncio.send_object(encoder, address, burst=1)
+    assert sender.done.result()
+    assert await protocol.done
+    assert decoder.output == data
+
+    received = []
+
+    def handler(session):
+        received.append(bytes(session.decoder.output))
+
+    transport, server = await kodo_asyncio.serve(
+        decoder_factory, ('127.0.0.1', 0), handler, timeout=args.timeout)
+    address = transport.get_extra_info('sockname')
+    encoder = kodo_object.ObjectEncoder(encoder_factory, data)
+    try:
+        sender = await kodo_asyncio.send_object(
+            encoder, address, burst=1, session=kodo_asyncio.new_session())
+    finally:
+        server.close()
+    assert sender.done.result()
+    assert received == [data]
+
+
+async def send(args):
+    """Send the objects concurrently."""
+    transfers = []
+    for i in range(args.transfers):
+        factory = kodo.FullVectorEncoderFactoryBinary8(
+            args.symbols, args.symbol_size)
+        encoder = kodo_object.ObjectEncoder(factory, os.urandom(args.size))
+        if args.multiplex:
+            address = (args.ip, args.port)
+            session = kodo_asyncio.new_session()
+        else:
+            address = (args.ip, args.port + i)
+            session = None
+        controller = None
+        if args.adaptive:
+            controller = kodo_redundancy.RedundancyController()
+        transfers.append(kodo_asyncio.send_object(
+            encoder, address, rate=args.rate,
+            max_redundancy=args.max_redundancy, session=session,
+            controller=controller, metrics=args.metrics))
+
+    return await asyncio.gather(*transfers)
+
+
+async def receive(args):
+    """Receive the objects concurrently."""
+    transfers = []
+    for i in range(args.transfers):
+        factory = kodo.FullVectorDecoderFactoryBinary8(
+            args.symbols, args.symbol_size)
+        decoder = kodo_object.ObjectDecoder(factory, args.size)
+        transfers.append(kodo_asyncio.receive_object(
+            decoder, ('0.0.0.0', args.port + i), timeout=args.timeout,
+            metrics=args.metrics))
+
+    return await asyncio.gather(*transfers)
+
+
+async def serve(args):
+    """Serve sessions on a single port until enough sessions are done."""
+    factory = kodo.FullVectorDecoderFactoryBinary8(
+        args.symbols, args.symbol_size)
+    done = asyncio.get_event_loop().create_future()
+
+    def handler(session):
+        if server.completed == args.transfers and not done.done():
+            done.set_result(True)
+
+    transport, server = await kodo_asyncio.serve(
+        factory, ('0.0.0.0', args.port), handler, timeout=args.timeout,
+        max_sessions=args.transfers, max_object_size=args.size,
+        max_total_size=args.transfers * args.size,
+        receive_buffer_size=4 * 1024 * 1024,
+        metrics=args.metrics)
+    print("Server running, press ctrl+c to stop.")
+    try:
+        await done
+    finally:
+        server.close()
+    return server
+
+
+if __name__ == "__main__":
+    main()
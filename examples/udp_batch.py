@@ -0,0 +1,171 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+import argparse
+import os
+import socket
+import time
+
+import kodo
+import kodo_batch
+
+
+def main():
+    """
+    Batched UDP sender and receiver.
+
+    The coded packets are sent and received a batch at a time, using
+    sendmmsg and recvmmsg where available.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Run without network use, for testing purposes')
+
+    parser.add_argument(
+        '--ip',
+        type=str,
+        help='ip of the receiver.',
+        default='127.0.0.1')
+
+    parser.add_argument(
+        '--port',
+        type=int,
+        help='data port on the receiver.',
+        default=41011)
+
+    parser.add_argument(
+        '--symbols',
+        type=int,
+        help='number of symbols in each generation/block.',
+        default=64)
+
+    parser.add_argument(
+        '--symbol-size',
+        type=int,
+        help='size of each symbol, in bytes.',
+        default=1400)
+
+    parser.add_argument(
+        '--batch',
+        type=int,
+        help='number of packets per batch.',
+        default=32)
+
+    parser.add_argument(
+        '--max-redundancy',
+        type=float,
+        help='maximum amount of redundancy to be sent, in percent.',
+        default=200)
+
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        help='timeout used by the receiver, in seconds.',
+        default=.2)
+
+    parser.add_argument(
+        'role',
+        choices=['sender', 'receiver'],
+        nargs='?',
+        help='the role of this node.')
+
+    args = parser.parse_args()
+
+    encoder_factory = kodo.FullVectorEncoderFactoryBinary8(
+        args.symbols, args.symbol_size)
+    decoder_factory = kodo.FullVectorDecoderFactoryBinary8(
+        args.symbols, args.symbol_size)
+
+    if args.dry_run:
+        # Transfer a block between a local pair of sockets
+        if not hasattr(socket, 'AF_UNIX'):
+            return
+        sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.settimeout(args.timeout)
+
+        encoder = encoder_factory.build()
+        data_in = os.urandom(encoder.block_size())
+        encoder.set_const_symbols(data_in)
+        decoder = decoder_factory.build()
+
+        size = encoder.payload_size()
+        send_batch = kodo_batch.BatchSocket(sender, args.batch, size)
+        receive_batch = kodo_batch.BatchSocket(receiver, args.batch, size)
+        while not decoder.is_complete():
+            send_batch.send_payloads(encoder, 4)
+            receive_batch.read_payloads(decoder)
+
+        assert decoder.copy_from_symbols() == data_in
+        return
+
+    if args.role is None:
+        parser.error("the role is required")
+
+    if args.role == 'sender':
+        send_data(args, encoder_factory)
+    else:
+        receive_data(args, decoder_factory)
+
+
+def send_data(args, encoder_factory):
+    """Send a block in batches of coded packets."""
+    encoder = encoder_factory.build()
+    encoder.set_const_symbols(os.urandom(encoder.block_size()))
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect((args.ip, args.port))
+    batch = kodo_batch.BatchSocket(sock, args.batch, encoder.payload_size())
+
+    count = int(args.symbols * (1 + args.max_redundancy / 100.0))
+    sent = 0
+    start = time.time()
+    while sent < count:
+        sent += batch.send_payloads(encoder, min(args.batch, count - sent))
+    seconds = time.time() - start
+
+    print("Sent {0} packets in {1:.3f}s using {2}.".format(
+        sent, seconds, 'sendmmsg' if batch.native else 'sendto'))
+
+
+def receive_data(args, decoder_factory):
+    """Receive and decode batches of coded packets."""
+    decoder = decoder_factory.build()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('0.0.0.0', args.port))
+    sock.settimeout(args.timeout)
+    batch = kodo_batch.BatchSocket(sock, args.batch, decoder.payload_size())
+
+    received = 0
+    start = None
+    while not decoder.is_complete():
+        try:
+            batch.read_payloads(decoder)
+        except socket.timeout:
+            if start is not None:
+                break
+            continue
+
+        if start is None:
+            start = time.time()
+        received += batch.received
+
+    if not decoder.is_complete():
+        print("Decoding failed")
+        return
+
+    print("Received {0} packets in {1:.3f}s using {2}.".format(
+        received, time.time() - start,
+        'recvmmsg' if batch.native else 'recvfrom_into'))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ import argparse
 import json
 
 import kodo
+import kodo_pacing
 
 
 def main():
@@ -98,6 +99,12 @@ def main():
         help='maximum amount of redundancy to be sent, in percent.',
         default=200)
 
+    client_parser.add_argument(
+        '--rate',
+        type=float,
+        help='maximum rate of the sender, in bits per second.',
+        default=None)
+
     client_parser.add_argument(
         '--timeout',
         type=float,
@@ -193,11 +200,19 @@ def send_data(settings, role):
         control_socket.bind(('', settings['server_control_port']))
         send(send_socket, "settings OK, sending", server_address)
 
+    # Pace the packets if a rate is given, allowing bursts of a few packets
+    bucket = None
+    if settings.get('rate'):
+        bucket = kodo_pacing.TokenBucket(
+            settings['rate'], 8 * encoder.payload_size())
+
     sent = 0
     start = time.time()
     end = None
     while sent < settings['symbols'] * settings['max_redundancy'] / 100:
         packet = encoder.write_payload()
+        if bucket is not None:
+            bucket.wait(len(packet))
         send(send_socket, packet, address)
         sent += 1
 
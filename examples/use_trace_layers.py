@@ -44,14 +44,15 @@ def main():
     # Enable the stdout trace function of the encoder
     encoder.set_trace_stdout()
 
-    # Define a custom trace function for the decoder which filters the
-    # trace message based on their zones
+    # Define a custom trace function for the decoder. Only the given zones
+    # are passed to the function, the other zones are filtered out natively
     def callback_function(zone, message):
-        if zone in ["decoder_state", "input_symbol_coefficients"]:
-            print("{}:".format(zone))
-            print(message)
+        print("{}:".format(zone))
+        print(message)
 
-    decoder.set_trace_callback(callback_function)
+    decoder.set_trace_callback(
+        callback_function,
+        zones=["decoder_state", "input_symbol_coefficients"])
 
     # Assign the data buffer to the encoder so that we may start
     # to produce encoded symbols from it
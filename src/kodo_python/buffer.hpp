@@ -0,0 +1,69 @@
+// Copyright Steinwurf ApS 2015.
+// Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+// See accompanying file LICENSE.rst or
+// http://www.steinwurf.com/licensing
+
+#pragma once
+
+#include <cstdint>
+
+#include <Python.h>
+#include <boost/noncopyable.hpp>
+#include <boost/python.hpp>
+
+namespace kodo_python
+{
+    /// Scoped access to the memory of a Python object which supports the
+    /// buffer protocol (e.g. bytes, bytearray, memoryview, numpy arrays and
+    /// mmap objects). The memory is accessed directly, i.e. no copies are
+    /// made, and the underlying buffer is released on destruction.
+    class buffer : boost::noncopyable
+    {
+    public:
+
+        buffer(const boost::python::object& object, int flags = PyBUF_SIMPLE)
+        {
+            if (PyObject_GetBuffer(object.ptr(), &m_view, flags) != 0)
+            {
+                boost::python::throw_error_already_set();
+            }
+        }
+
+        ~buffer()
+        {
+            PyBuffer_Release(&m_view);
+        }
+
+        uint8_t* data() const
+        {
+            return (uint8_t*)m_view.buf;
+        }
+
+        uint32_t size() const
+        {
+            return (uint32_t)m_view.len;
+        }
+
+        bool is_writable() const
+        {
+            return m_view.readonly == 0;
+        }
+
+    private:
+
+        Py_buffer m_view;
+    };
+
+    /// Raise a ValueError if the buffer cannot hold the required number of
+    /// bytes starting at the given offset
+    inline void check_buffer_size(
+        const buffer& data, uint32_t offset, uint64_t required)
+    {
+        if (offset + required > data.size())
+        {
+            PyErr_SetString(PyExc_ValueError,
+                "The buffer is too small for the requested operation.");
+            boost::python::throw_error_already_set();
+        }
+    }
+}
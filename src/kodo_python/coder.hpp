@@ -5,11 +5,17 @@
 
 #pragma once
 
+#include <chrono>
+#include <cstdlib>
+#include <set>
+#include <sstream>
 #include <string>
+#include <vector>
 
 #include <Python.h>
 #include <boost/python.hpp>
 #include <boost/python/args.hpp>
+#include <boost/python/stl_iterator.hpp>
 
 #include <kodo_core/has_rank.hpp>
 
@@ -18,8 +24,31 @@
 #include <kodo_core/has_set_trace_stdout.hpp>
 #include <kodo_core/has_set_trace_callback.hpp>
 
+#include "counted_coder.hpp"
+#include "gil.hpp"
+
 namespace kodo_python
 {
+    template<class Coder>
+    PyObject* symbol_pivots(Coder& coder)
+    {
+        std::vector<uint8_t> pivots(coder.symbols());
+        {
+            release_gil nogil;
+            for (uint32_t i = 0; i < coder.symbols(); ++i)
+            {
+                pivots[i] = coder.is_symbol_pivot(i) ? 1 : 0;
+            }
+        }
+        #if PY_MAJOR_VERSION >= 3
+        return PyBytes_FromStringAndSize(
+            (char*)pivots.data(), pivots.size());
+        #else
+        return PyString_FromStringAndSize(
+            (char*)pivots.data(), pivots.size());
+        #endif
+    }
+
     template<bool HasIsSymbolPivot>
     struct is_symbol_pivot_method
     {
@@ -45,6 +74,15 @@ namespace kodo_python
                 "when generating coding coefficients.\n\n"
                 "\t:param symbol_index: The index of the symbol.\n"
                 "\t:returns: True if the symbol is available.\n"
+            )
+            .def("symbol_pivots",
+                &symbol_pivots<typename CoderClass::wrapped_type>,
+                "Return the pivot state of all symbols in a single call.\n\n"
+                "The state of symbol i is byte i of the result, which is 1 "
+                "if the symbol is a pivot and otherwise 0. The result can be "
+                "used as a numpy array with numpy.frombuffer(pivots, "
+                "dtype=numpy.uint8).\n\n"
+                "\t:returns: A bytes object of symbols() bytes.\n"
             );
         }
     };
@@ -77,12 +115,189 @@ namespace kodo_python
     };
 
     template<class Coder>
-    void set_trace_callback(Coder& coder, PyObject* function)
+    boost::python::dict stats(Coder& coder)
+    {
+        const coder_stats& stats = coder.stats();
+
+        boost::python::dict result;
+        result["payloads_written"] = stats.payloads_written;
+        result["payloads_read"] = stats.payloads_read;
+        result["non_innovative"] = stats.non_innovative;
+        result["bytes_written"] = stats.bytes_written;
+        result["bytes_read"] = stats.bytes_read;
+        result["elimination_time"] =
+            std::chrono::duration<double>(stats.elimination_time).count();
+        return result;
+    }
+
+    template<class Coder>
+    void reset_stats(Coder& coder)
+    {
+        coder.stats().reset();
+    }
+
+    /// Writes a payload with an encoder or a recoding decoder and counts it.
+    template<class Coder>
+    uint32_t write_payload(Coder& coder, uint8_t* payload)
+    {
+        uint32_t length = coder.write_payload(payload);
+
+        coder_stats& stats = coder.stats();
+        ++stats.payloads_written;
+        stats.bytes_written += length;
+        return length;
+    }
+
+    /// Selects the trace zones which are passed on to Python. The zones
+    /// are filtered before the GIL is acquired, so the events of the other
+    /// zones never reach the interpreter. Note that the stacks still format
+    /// the messages of every zone before the filter is called.
+    class zone_filter
     {
-        auto callback = [function](
+    public:
+
+        zone_filter(boost::python::object zones) :
+            m_all(zones.is_none())
+        {
+            if (m_all)
+            {
+                return;
+            }
+
+            // A single zone given as a string would otherwise be iterated
+            // one character at a time
+            boost::python::extract<std::string> zone(zones);
+            if (zone.check())
+            {
+                m_zones.insert(zone());
+                return;
+            }
+
+            boost::python::stl_input_iterator<std::string>
+                begin(zones), end;
+            m_zones.insert(begin, end);
+        }
+
+        bool operator()(const std::string& zone) const
+        {
+            return m_all || m_zones.count(zone) > 0;
+        }
+
+    private:
+
+        bool m_all;
+        std::set<std::string> m_zones;
+    };
+
+    /// A whitespace separated field of a trace message
+    struct trace_field
+    {
+        bool is_integer;
+        long long integer;
+        std::string text;
+    };
+
+    using trace_line = std::vector<trace_field>;
+
+    /// Splits a trace message into lines of fields and converts the integer
+    /// fields. This does not use any Python objects, so it is done before
+    /// the GIL is acquired.
+    inline std::vector<trace_line> parse_trace(const std::string& message)
+    {
+        std::vector<trace_line> lines;
+        std::istringstream message_stream(message);
+        std::string line;
+        while (std::getline(message_stream, line))
+        {
+            trace_line fields;
+            std::istringstream line_stream(line);
+            std::string text;
+            while (line_stream >> text)
+            {
+                trace_field field;
+                char* end = nullptr;
+                field.integer = std::strtoll(text.c_str(), &end, 10);
+                field.is_integer = *end == '\0';
+                if (!field.is_integer)
+                {
+                    field.text = text;
+                }
+                fields.push_back(field);
+            }
+
+            if (!fields.empty())
+            {
+                lines.push_back(fields);
+            }
+        }
+        return lines;
+    }
+
+    /// Converts the parsed lines of a trace message to a tuple of tuples.
+    inline boost::python::tuple trace_rows(const std::vector<trace_line>& lines)
+    {
+        using namespace boost::python;
+
+        list rows;
+        for (const auto& line : lines)
+        {
+            list row;
+            for (const auto& field : line)
+            {
+                if (field.is_integer)
+                {
+                    row.append(field.integer);
+                }
+                else
+                {
+                    row.append(field.text);
+                }
+            }
+            rows.append(tuple(row));
+        }
+        return tuple(rows);
+    }
+
+    template<class Coder>
+    void set_trace_callback(Coder& coder, boost::python::object function,
+                            boost::python::object zones)
+    {
+        // The coders may trace while the GIL is released, so the GIL must
+        // be acquired before calling the Python function.
+        zone_filter filter(zones);
+        auto callback = [function, filter](
             const std::string& zone, const std::string& message)
         {
-            boost::python::call<void>(function, zone, message);
+            if (!filter(zone))
+            {
+                return;
+            }
+
+            acquire_gil gil;
+            boost::python::call<void>(function.ptr(), zone, message);
+        };
+
+        coder.set_trace_callback(callback);
+    }
+
+    template<class Coder>
+    void set_trace_events(Coder& coder, boost::python::object function,
+                          boost::python::object zones)
+    {
+        zone_filter filter(zones);
+        auto callback = [function, filter](
+            const std::string& zone, const std::string& message)
+        {
+            if (!filter(zone))
+            {
+                return;
+            }
+
+            auto lines = parse_trace(message);
+
+            acquire_gil gil;
+            boost::python::call<void>(
+                function.ptr(), zone, trace_rows(lines));
         };
 
         coder.set_trace_callback(callback);
@@ -104,13 +319,38 @@ namespace kodo_python
         template<class CoderClass>
         set_trace_callback_method(CoderClass& coder_class)
         {
+            using boost::python::arg;
+
             coder_class
             .def("set_trace_callback",
                 &set_trace_callback<typename CoderClass::wrapped_type>,
-                boost::python::arg("callback"),
+                (arg("callback"), arg("zones") = boost::python::object()),
                 "Write the trace information to a callback.\n\n"
                 "\t:param callback: The callback which is called with the zone "
-                "and message.");
+                "and message.\n"
+                "\t:param zones: The zones passed to the callback, a single "
+                "zone, or None for all zones. The other zones are filtered "
+                "out before calling into Python. The coders still format the "
+                "messages of every zone before they are filtered, so tracing "
+                "is not free even if few zones are selected.\n")
+            .def("set_trace_events",
+                &set_trace_events<typename CoderClass::wrapped_type>,
+                (arg("callback"), arg("zones") = boost::python::object()),
+                "Write the trace information to a callback as structured "
+                "events.\n\n"
+                "Every line of a trace message is converted to a tuple of its "
+                "whitespace separated fields, where the integer fields are "
+                "converted to int, e.g. the line \"2 C: 0 1 32\" of the "
+                "decoder_state zone becomes (2, 'C:', 0, 1, 32). The "
+                "messages are split natively and only for the selected "
+                "zones.\n\n"
+                "\t:param callback: The callback which is called with the zone "
+                "and a tuple of the lines of the message.\n"
+                "\t:param zones: The zones passed to the callback, a single "
+                "zone, or None for all zones. The other zones are filtered "
+                "out before calling into Python. The coders still format the "
+                "messages of every zone before they are filtered, so tracing "
+                "is not free even if few zones are selected.\n");
         }
     };
 
@@ -167,11 +407,12 @@ namespace kodo_python
         class Field, class TraceTag
     >
     auto coder(const std::string& name) ->
-        boost::python::class_<Coder<Field, TraceTag>, boost::noncopyable>
+        boost::python::class_<
+            counted_coder<Coder<Field, TraceTag>>, boost::noncopyable>
     {
         using namespace boost::python;
 
-        typedef Coder<Field, TraceTag> coder_type;
+        typedef counted_coder<Coder<Field, TraceTag>> coder_type;
         auto coder_class = class_<coder_type, boost::noncopyable>(
             name.c_str(), "An (en/de)coder", no_init)
         .def("payload_size", &coder_type::payload_size,
@@ -190,6 +431,20 @@ namespace kodo_python
         .def("symbols", &coder_type::symbols,
             "Return the number of symbols in this block coder.\n\n"
             "\t:returns: The number of symbols in this block coder.\n"
+        )
+        .def("stats", &stats<coder_type>,
+            "Return the counters of the coder.\n\n"
+            "The counters are always on and cost far less than the trace. "
+            "They are cleared by reset_stats() and when the coder is "
+            "recycled by its factory.\n\n"
+            "\t:returns: A dict with the number of payloads_written and "
+            "payloads_read, the number of non_innovative payloads read, i.e. "
+            "payloads which did not increase the rank, the number of "
+            "bytes_written and bytes_read, and the elimination_time spent "
+            "decoding in seconds.\n"
+        )
+        .def("reset_stats", &reset_stats<coder_type>,
+            "Reset the counters of the coder to zero.\n"
         );
 
         (is_symbol_pivot_method<
@@ -0,0 +1,141 @@
+// Copyright Steinwurf ApS 2016.
+// Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+// See accompanying file LICENSE.rst or
+// http://www.steinwurf.com/licensing
+
+#pragma once
+
+#include <chrono>
+#include <cstdint>
+#include <memory>
+#include <vector>
+
+#include <kodo_core/rebind_factory.hpp>
+
+namespace kodo_python
+{
+    /// The counters of a coder. They are updated by the bindings on every
+    /// payload, so they cost a few increments per call and are always on,
+    /// unlike the trace which formats a string for every event.
+    struct coder_stats
+    {
+        coder_stats()
+        {
+            reset();
+        }
+
+        void reset()
+        {
+            payloads_written = 0;
+            payloads_read = 0;
+            non_innovative = 0;
+            bytes_written = 0;
+            bytes_read = 0;
+            elimination_time = std::chrono::nanoseconds::zero();
+        }
+
+        uint64_t payloads_written;
+        uint64_t payloads_read;
+        uint64_t non_innovative;
+        uint64_t bytes_written;
+        uint64_t bytes_read;
+        std::chrono::nanoseconds elimination_time;
+    };
+
+    /// Measures the time spent in a scope and adds it to a duration.
+    class scoped_timer
+    {
+    public:
+
+        using clock_type = std::chrono::steady_clock;
+
+        scoped_timer(std::chrono::nanoseconds& duration) :
+            m_duration(duration),
+            m_start(clock_type::now())
+        { }
+
+        ~scoped_timer()
+        {
+            m_duration += std::chrono::duration_cast<std::chrono::nanoseconds>(
+                clock_type::now() - m_start);
+        }
+
+    private:
+
+        std::chrono::nanoseconds& m_duration;
+        clock_type::time_point m_start;
+    };
+
+    /// A coder stack extended with counters and with the state the
+    /// bindings keep for it. The factory is rebound, so that it builds the
+    /// extended coder instead of the stack.
+    template<class Stack>
+    class counted_coder : public Stack
+    {
+    public:
+
+        using factory = kodo_core::rebind_factory<Stack, counted_coder>;
+
+    public:
+
+        /// Initializes the stack and clears the counters and the state of
+        /// the previous use, so that a recycled coder starts from zero.
+        template<class Factory>
+        void initialize(Factory& the_factory)
+        {
+            // The first initialization is done by the factory which built
+            // the coder, and its memory is allocated for these limits
+            if (m_max_symbols == 0)
+            {
+                m_max_symbols = the_factory.max_symbols();
+                m_max_symbol_size = the_factory.max_symbol_size();
+            }
+
+            Stack::initialize(the_factory);
+            m_stats.reset();
+            m_storage.reset();
+            m_taken.clear();
+        }
+
+        /// Keeps an object alive while the coder refers to it, e.g. the
+        /// buffer bound as the symbol storage.
+        void hold_storage(std::shared_ptr<void> storage)
+        {
+            m_storage = std::move(storage);
+        }
+
+        const std::shared_ptr<void>& storage() const
+        {
+            return m_storage;
+        }
+
+        /// The symbols which have been handed out as decoded, see
+        /// take_decoded()
+        std::vector<bool>& taken()
+        {
+            return m_taken;
+        }
+
+        coder_stats& stats()
+        {
+            return m_stats;
+        }
+
+        /// Checks whether the coder was built by a factory with the same
+        /// limits, so that the factory can initialize it
+        template<class Factory>
+        bool has_limits_of(const Factory& the_factory) const
+        {
+            return m_max_symbols == the_factory.max_symbols() &&
+                m_max_symbol_size == the_factory.max_symbol_size();
+        }
+
+    private:
+
+        uint32_t m_max_symbols = 0;
+        uint32_t m_max_symbol_size = 0;
+        coder_stats m_stats;
+        std::shared_ptr<void> m_storage;
+        std::vector<bool> m_taken;
+    };
+}
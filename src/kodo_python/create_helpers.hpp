@@ -12,12 +12,11 @@
 #include <fifi/binary8.hpp>
 #include <fifi/binary16.hpp>
 
-#include <kodo_core/enable_trace.hpp>
-
 #include "encoder.hpp"
 #include "decoder.hpp"
 #include "factory.hpp"
 #include "resolve_field_name.hpp"
+#include "resolve_trace_name.hpp"
 
 namespace kodo_python
 {
@@ -25,18 +24,26 @@ namespace kodo_python
     void create_factory_and_encoder(const std::string& stack)
     {
         // First create the factory type
-        factory<Coder, Field, meta::typelist<kodo_core::enable_trace>>(stack);
+        factory<Coder, Field, trace_enabled>(stack);
         // Then create the corresponding encoder type
-        encoder<Coder, Field, meta::typelist<kodo_core::enable_trace>>(stack);
+        encoder<Coder, Field, trace_enabled>(stack);
+
+        // The same stack without tracing
+        factory<Coder, Field, trace_disabled>(stack);
+        encoder<Coder, Field, trace_disabled>(stack);
     }
 
     template<template<class, class> class Coder, class Field>
     void create_factory_and_decoder(const std::string& stack)
     {
         // First create the factory type
-        factory<Coder, Field, meta::typelist<kodo_core::enable_trace>>(stack);
+        factory<Coder, Field, trace_enabled>(stack);
         // Then create the corresponding decoder type
-        decoder<Coder, Field, meta::typelist<kodo_core::enable_trace>>(stack);
+        decoder<Coder, Field, trace_enabled>(stack);
+
+        // The same stack without tracing
+        factory<Coder, Field, trace_disabled>(stack);
+        decoder<Coder, Field, trace_disabled>(stack);
     }
 
     template<template<class, class> class Coder>
@@ -6,6 +6,7 @@
 #pragma once
 
 #include <algorithm>
+#include <memory>
 #include <string>
 #include <vector>
 
@@ -13,14 +14,20 @@
 #include <bytesobject.h>
 #include <boost/python.hpp>
 #include <boost/python/args.hpp>
+#include <boost/python/stl_iterator.hpp>
 
 #include <kodo_core/has_partial_decoding_tracker.hpp>
+#include <kodo_core/has_set_mutable_symbols.hpp>
 #include <kodo_core/has_write_payload.hpp>
 
 #include <sak/storage.hpp>
 
+#include "buffer.hpp"
 #include "coder.hpp"
+#include "gil.hpp"
 #include "resolve_field_name.hpp"
+#include "resolve_trace_name.hpp"
+#include "storage_view.hpp"
 
 namespace kodo_python
 {
@@ -30,7 +37,10 @@ namespace kodo_python
         std::vector<uint8_t> payload(decoder.block_size());
         auto storage = sak::mutable_storage(
             payload.data(), decoder.block_size());
-        decoder.copy_from_symbols(storage);
+        {
+            release_gil nogil;
+            decoder.copy_from_symbols(storage);
+        }
         #if PY_MAJOR_VERSION >= 3
         return PyBytes_FromStringAndSize(
             (char*)payload.data(), decoder.block_size());
@@ -46,7 +56,10 @@ namespace kodo_python
         std::vector<uint8_t> payload(decoder.symbol_size());
         auto storage = sak::mutable_storage(
             payload.data(), decoder.symbol_size());
-        decoder.copy_from_symbol(index, storage);
+        {
+            release_gil nogil;
+            decoder.copy_from_symbol(index, storage);
+        }
         #if PY_MAJOR_VERSION >= 3
         return PyBytes_FromStringAndSize(
             (char*)payload.data(), decoder.symbol_size());
@@ -56,11 +69,191 @@ namespace kodo_python
         #endif
     }
 
+    template<class Decoder>
+    uint32_t copy_from_symbols_into(
+        Decoder& decoder, boost::python::object data, uint32_t offset)
+    {
+        buffer symbols(data, PyBUF_WRITABLE);
+        check_buffer_size(symbols, offset, 0);
+
+        uint8_t* destination = symbols.data() + offset;
+        uint32_t length =
+            std::min(decoder.block_size(), symbols.size() - offset);
+
+        release_gil nogil;
+
+        if (length == decoder.block_size())
+        {
+            decoder.copy_from_symbols(
+                sak::mutable_storage(destination, length));
+            return length;
+        }
+
+        // Only a part of the block fits, so copy the whole symbols that fit
+        // and then the beginning of the next symbol
+        uint32_t symbol_size = decoder.symbol_size();
+        uint32_t symbols_to_copy = length / symbol_size;
+        for (uint32_t i = 0; i < symbols_to_copy; ++i)
+        {
+            decoder.copy_from_symbol(i, sak::mutable_storage(
+                destination + i * symbol_size, symbol_size));
+        }
+
+        uint32_t remaining = length % symbol_size;
+        if (remaining > 0)
+        {
+            std::vector<uint8_t> symbol(symbol_size);
+            decoder.copy_from_symbol(symbols_to_copy,
+                sak::mutable_storage(symbol.data(), symbol_size));
+            std::copy(symbol.data(), symbol.data() + remaining,
+                destination + symbols_to_copy * symbol_size);
+        }
+        return length;
+    }
+
+    template<class Decoder>
+    void copy_from_symbol_into(Decoder& decoder, uint32_t index,
+                               boost::python::object data, uint32_t offset)
+    {
+        buffer symbol(data, PyBUF_WRITABLE);
+        check_buffer_size(symbol, offset, decoder.symbol_size());
+
+        release_gil nogil;
+        decoder.copy_from_symbol(index, sak::mutable_storage(
+            symbol.data() + offset, decoder.symbol_size()));
+    }
+
+    template<class Decoder>
+    void set_mutable_symbols(Decoder& decoder, boost::python::object data)
+    {
+        auto symbols = std::make_shared<buffer>(data, PyBUF_WRITABLE);
+        check_buffer_size(*symbols, 0, decoder.block_size());
+
+        decoder.set_mutable_symbols(sak::mutable_storage(
+            symbols->data(), decoder.block_size()));
+
+        // The decoder writes into the buffer until it is built or recycled
+        // again, so the buffer stays exported until then. This also keeps
+        // e.g. a bytearray from being resized under the decoder.
+        decoder.hold_storage(symbols);
+    }
+
+    template<class Decoder>
+    PyObject* symbols_view(boost::python::object self)
+    {
+        Decoder& decoder = boost::python::extract<Decoder&>(self);
+
+        // The view covers the storage directly if the symbols are stored
+        // back to back, otherwise it covers a copy of the symbols
+        const uint8_t* data = decoder.symbol(0);
+        for (uint32_t i = 1; i < decoder.symbols(); ++i)
+        {
+            if (decoder.symbol(i) != data + i * decoder.symbol_size())
+            {
+                boost::python::object copy(boost::python::handle<>(
+                    copy_from_symbols(decoder)));
+                return PyMemoryView_FromObject(copy.ptr());
+            }
+        }
+
+        return make_storage_view(
+            self.ptr(), decoder.storage(), data, decoder.block_size());
+    }
+
+    template<class Decoder>
+    PyObject* symbol_view(boost::python::object self, uint32_t index)
+    {
+        Decoder& decoder = boost::python::extract<Decoder&>(self);
+
+        if (index >= decoder.symbols())
+        {
+            PyErr_SetString(PyExc_IndexError, "Symbol index out of range.");
+            boost::python::throw_error_already_set();
+        }
+
+        return make_storage_view(self.ptr(), decoder.storage(),
+            decoder.symbol(index), decoder.symbol_size());
+    }
+
+    template<class Decoder>
+    boost::python::list take_decoded(Decoder& decoder)
+    {
+        std::vector<bool>& taken = decoder.taken();
+        taken.resize(decoder.symbols(), false);
+
+        std::vector<uint32_t> indices;
+        {
+            release_gil nogil;
+
+            // All symbols are decoded once the decoder is complete, even if
+            // the stack does not track the state of each symbol exactly
+            bool complete = decoder.is_complete();
+            for (uint32_t i = 0; i < decoder.symbols(); ++i)
+            {
+                if (!taken[i] && (complete || decoder.is_symbol_uncoded(i)))
+                {
+                    taken[i] = true;
+                    indices.push_back(i);
+                }
+            }
+        }
+
+        boost::python::list result;
+        for (auto index : indices)
+        {
+            result.append(index);
+        }
+        return result;
+    }
+
+    /// The states of the symbols returned by symbol_states()
+    enum symbol_state : uint8_t
+    {
+        symbol_missing = 0,
+        symbol_partially_decoded = 1,
+        symbol_uncoded = 2
+    };
+
+    template<class Decoder>
+    PyObject* symbol_states(Decoder& decoder)
+    {
+        std::vector<uint8_t> states(decoder.symbols());
+        {
+            release_gil nogil;
+            for (uint32_t i = 0; i < decoder.symbols(); ++i)
+            {
+                if (decoder.is_symbol_uncoded(i))
+                {
+                    states[i] = symbol_uncoded;
+                }
+                else if (decoder.is_symbol_partially_decoded(i))
+                {
+                    states[i] = symbol_partially_decoded;
+                }
+                else
+                {
+                    states[i] = symbol_missing;
+                }
+            }
+        }
+        #if PY_MAJOR_VERSION >= 3
+        return PyBytes_FromStringAndSize(
+            (char*)states.data(), states.size());
+        #else
+        return PyString_FromStringAndSize(
+            (char*)states.data(), states.size());
+        #endif
+    }
+
     template<class Decoder>
     PyObject* decoder_write_payload(Decoder& decoder)
     {
         std::vector<uint8_t> payload(decoder.payload_size());
-        auto length = decoder.write_payload(payload.data());
+        uint32_t length = 0;
+        {
+            release_gil nogil;
+            length = write_payload(decoder, payload.data());
+        }
 
         #if PY_MAJOR_VERSION >= 3
         return PyBytes_FromStringAndSize((char*)payload.data(), length);
@@ -70,11 +263,108 @@ namespace kodo_python
     }
 
     template<class Decoder>
-    void read_payload(Decoder& decoder, const std::string& data)
+    uint32_t decoder_write_payload_into(
+        Decoder& decoder, boost::python::object data, uint32_t offset)
+    {
+        buffer payload(data, PyBUF_WRITABLE);
+        check_buffer_size(payload, offset, decoder.payload_size());
+
+        release_gil nogil;
+        return write_payload(decoder, payload.data() + offset);
+    }
+
+    template<class Decoder>
+    void decode_payload(Decoder& decoder, uint8_t* payload, uint32_t size,
+                        bool inplace, std::vector<uint8_t>& scratch)
+    {
+        coder_stats& stats = decoder.stats();
+        ++stats.payloads_read;
+        stats.bytes_read += size;
+
+        // The decoder uses the payload as scratch space while decoding, so
+        // only a writable buffer that is large enough, and that the caller
+        // gave up, can be decoded in place. Anything else is copied once.
+        if (!inplace || size < decoder.payload_size())
+        {
+            scratch.resize(std::max(size, decoder.payload_size()));
+            std::copy(payload, payload + size, scratch.data());
+            payload = scratch.data();
+        }
+
+        uint32_t rank = decoder.rank();
+        {
+            scoped_timer timer(stats.elimination_time);
+            decoder.read_payload(payload);
+        }
+
+        if (decoder.rank() == rank)
+        {
+            ++stats.non_innovative;
+        }
+    }
+
+    template<class Decoder>
+    void read_payload(Decoder& decoder, boost::python::object data,
+                      bool inplace)
     {
-        std::vector<uint8_t> payload(data.length());
-        std::copy(data.c_str(), data.c_str() + data.length(), payload.data());
-        decoder.read_payload(payload.data());
+        buffer payload(data);
+        std::vector<uint8_t> scratch;
+
+        release_gil nogil;
+        decode_payload(decoder, payload.data(), payload.size(),
+                       inplace && payload.is_writable(), scratch);
+    }
+
+    template<class Decoder>
+    uint32_t read_payloads(Decoder& decoder, boost::python::object data,
+                           boost::python::object lengths, bool inplace)
+    {
+        using boost::python::stl_input_iterator;
+
+        uint32_t consumed = 0;
+        std::vector<uint8_t> scratch;
+
+        // Without lengths the data is an iterable of separate payloads
+        if (lengths.is_none())
+        {
+            stl_input_iterator<boost::python::object> it(data), end;
+            for (; it != end && !decoder.is_complete(); ++it, ++consumed)
+            {
+                buffer payload(*it);
+
+                release_gil nogil;
+                decode_payload(decoder, payload.data(), payload.size(),
+                               inplace && payload.is_writable(), scratch);
+            }
+            return consumed;
+        }
+
+        stl_input_iterator<uint32_t> begin(lengths), end;
+        std::vector<uint32_t> sizes(begin, end);
+
+        buffer payloads(data);
+        uint64_t total = 0;
+        for (auto size : sizes)
+        {
+            total += size;
+        }
+        check_buffer_size(payloads, 0, total);
+
+        release_gil nogil;
+
+        uint8_t* payload = payloads.data();
+        for (auto size : sizes)
+        {
+            if (decoder.is_complete())
+            {
+                break;
+            }
+            decode_payload(decoder, payload, size,
+                           inplace && payloads.is_writable(), scratch);
+            payload += size;
+            ++consumed;
+        }
+        return consumed;
     }
 
     template<bool HasPartialDecodingTracker>
@@ -118,15 +408,86 @@ namespace kodo_python
         template<class DecoderClass>
         write_payload_method(DecoderClass& decoder_class)
         {
+            using boost::python::arg;
+
             decoder_class
             .def("write_payload",
                 &decoder_write_payload<typename DecoderClass::wrapped_type>,
                 "Recode symbol.\n\n"
                 "\t:returns: The recoded symbol.\n"
+            )
+            .def("write_payload_into",
+                &decoder_write_payload_into<
+                    typename DecoderClass::wrapped_type>,
+                (arg("buffer"), arg("offset") = 0),
+                "Recode a symbol into a writable buffer.\n\n"
+                "The buffer must be able to hold payload_size() bytes "
+                "starting at the given offset.\n\n"
+                "\t:param buffer: The writable buffer, e.g. a bytearray.\n"
+                "\t:param offset: The offset in bytes where the payload is "
+                "written.\n"
+                "\t:returns: The number of bytes written.\n"
             );
         }
     };
 
+    template<bool HasSetMutableSymbols>
+    struct set_mutable_symbols_method
+    {
+        template<class DecoderClass>
+        set_mutable_symbols_method(DecoderClass& decoder_class)
+        {
+            (void) decoder_class;
+        }
+    };
+
+    template<>
+    struct set_mutable_symbols_method<true>
+    {
+        template<class DecoderClass>
+        set_mutable_symbols_method(DecoderClass& decoder_class)
+        {
+            using boost::python::arg;
+
+            decoder_class
+            .def("set_mutable_symbols",
+                &set_mutable_symbols<typename DecoderClass::wrapped_type>,
+                arg("buffer"),
+                "Use a writable buffer as the storage of the decoded "
+                "symbols.\n\n"
+                "The symbols are decoded directly into the buffer, so no "
+                "copy_from_symbols() call is needed to get the data. The "
+                "buffer must be able to hold block_size() bytes and must be "
+                "set before any payload is read, i.e. right after build() or "
+                "recycle(). The decoder keeps the buffer until it is "
+                "recycled or deleted, so e.g. a bytearray cannot be resized "
+                "meanwhile.\n\n"
+                "\t:param buffer: The writable buffer, e.g. a bytearray, a "
+                "numpy array or a writable mmap.\n"
+            );
+        }
+    };
+
+    /// The methods of decoders which decode symbols before the block is
+    /// complete
+    struct take_decoded_method
+    {
+        template<class DecoderClass>
+        take_decoded_method(DecoderClass& decoder_class)
+        {
+            decoder_class
+            .def("take_decoded",
+                &take_decoded<typename DecoderClass::wrapped_type>,
+                "Return the symbols decoded since the last call.\n\n"
+                "Each decoded symbol is returned once, so the data of the "
+                "symbols can be forwarded as soon as they are decoded "
+                "instead of when the decoder is complete. Recycling the "
+                "decoder starts over.\n\n"
+                "\t:returns: A list of the indices of the newly decoded "
+                "symbols in increasing order.\n");
+        }
+    };
+
     template<template<class, class> class Coder>
     struct extra_decoder_methods
     {
@@ -144,16 +505,39 @@ namespace kodo_python
     void decoder(const std::string& stack)
     {
         using boost::python::arg;
-        using decoder_type = Coder<Field, TraceTag>;
+        using decoder_type = counted_coder<Coder<Field, TraceTag>>;
 
         std::string field = resolve_field_name<Field>();
         std::string kind = "Decoder";
-        std::string name = stack + kind + field;
+        std::string trace = resolve_trace_name<TraceTag>();
+        std::string name = stack + kind + field + trace;
 
         auto decoder_class = coder<Coder, Field, TraceTag>(name)
-        .def("read_payload", &read_payload<decoder_type>, arg("symbol_data"),
+        .def("read_payload", &read_payload<decoder_type>,
+            (arg("symbol_data"), arg("inplace") = false),
             "Decode the provided encoded symbol.\n\n"
+            "The symbol data can be any object supporting the buffer "
+            "protocol, e.g. bytes, bytearray, memoryview or a numpy array. "
+            "The decoder needs a scratch copy of the symbol data, unless "
+            "inplace is True and the buffer is writable. Then the buffer "
+            "itself is used, which saves the copy, but its content is "
+            "undefined after this call.\n\n"
             "\t:param symbol_data: The encoded symbol.\n"
+            "\t:param inplace: True to decode a writable buffer in place.\n"
+        )
+        .def("read_payloads", &read_payloads<decoder_type>,
+            (arg("payloads"), arg("lengths") = boost::python::object(),
+             arg("inplace") = false),
+            "Decode a number of encoded symbols in a single call.\n\n"
+            "If lengths is given, the payloads are packed back to back in a "
+            "single buffer, i.e. payload i starts where payload i - 1 ends. "
+            "Otherwise payloads is an iterable of separate buffers. Decoding "
+            "stops as soon as the decoder is complete.\n\n"
+            "\t:param payloads: The buffer or iterable of encoded symbols.\n"
+            "\t:param lengths: The length of each payload in the buffer.\n"
+            "\t:param inplace: True to decode writable buffers in place, "
+            "see read_payload().\n"
+            "\t:returns: The number of payloads consumed.\n"
         )
         .def("is_complete", &decoder_type::is_complete,
             "Check whether decoding is complete.\n\n"
@@ -204,6 +588,16 @@ namespace kodo_python
             "\t:return: True if the symbol is partially decoded otherwise\n"
             "\t         false.\n"
         )
+        .def("symbol_states", &symbol_states<decoder_type>,
+            "Return the state of all symbols in a single call.\n\n"
+            "The state of symbol i is byte i of the result: 0 if the symbol "
+            "is missing, 1 if it is partially decoded and 2 if it is "
+            "uncoded. As with is_symbol_uncoded(), some algorithms may "
+            "report an uncoded symbol as partially decoded. The result can "
+            "be used as a numpy array with numpy.frombuffer(states, "
+            "dtype=numpy.uint8).\n\n"
+            "\t:returns: A bytes object of symbols() bytes.\n"
+        )
         .def("copy_from_symbol", &copy_from_symbol<decoder_type>,
             arg("index"),
             "Return the decoded symbol.\n\n"
@@ -213,12 +607,55 @@ namespace kodo_python
         .def("copy_from_symbols", &copy_from_symbols<decoder_type>,
             "Return the decoded symbols.\n\n"
             "\t:returns: The decoded symbols.\n"
+        )
+        .def("symbols_view", &symbols_view<decoder_type>,
+            "Return a read-only view of the decoded symbols.\n\n"
+            "The view is a memoryview of the memory of the decoder, so no "
+            "copy is made and the view follows the decoding. It keeps the "
+            "decoder alive, but its content is undefined once the decoder is "
+            "recycled. If the decoder does not store the symbols back to "
+            "back, the view is of a copy of the symbols.\n\n"
+            "\t:returns: A memoryview of block_size() bytes.\n"
+        )
+        .def("symbol_view", &symbol_view<decoder_type>, arg("index"),
+            "Return a read-only view of a decoded symbol.\n\n"
+            "Like symbols_view(), the view is of the memory of the decoder "
+            "and keeps the decoder alive.\n\n"
+            "\t:param index: Index of the symbol.\n"
+            "\t:returns: A memoryview of symbol_size() bytes.\n"
+        )
+        .def("copy_from_symbol_into", &copy_from_symbol_into<decoder_type>,
+            (arg("index"), arg("buffer"), arg("offset") = 0),
+            "Copy a decoded symbol into a writable buffer.\n\n"
+            "The buffer must be able to hold symbol_size() bytes starting at "
+            "the given offset.\n\n"
+            "\t:param index: Index of the symbol to copy.\n"
+            "\t:param buffer: The writable buffer, e.g. a bytearray or a "
+            "writable mmap.\n"
+            "\t:param offset: The offset in bytes where the symbol is "
+            "written.\n"
+        )
+        .def("copy_from_symbols_into", &copy_from_symbols_into<decoder_type>,
+            (arg("buffer"), arg("offset") = 0),
+            "Copy the decoded symbols into a writable buffer.\n\n"
+            "If the buffer cannot hold block_size() bytes starting at the "
+            "given offset, only the beginning of the block that fits is "
+            "copied.\n\n"
+            "\t:param buffer: The writable buffer, e.g. a bytearray or a "
+            "writable mmap.\n"
+            "\t:param offset: The offset in bytes where the symbols are "
+            "written.\n"
+            "\t:returns: The number of bytes copied.\n"
         );
 
 
         (write_payload_method<
             kodo_core::has_write_payload<decoder_type>::value>(decoder_class));
 
+        (set_mutable_symbols_method<
+            kodo_core::has_set_mutable_symbols<decoder_type>::value>(
+                decoder_class));
+
         (is_partially_complete_method<
             kodo_core::has_partial_decoding_tracker<decoder_type>::value>(
                 decoder_class));
@@ -15,24 +15,32 @@
 
 #include <kodo_core/has_set_systematic_off.hpp>
 
+#include "buffer.hpp"
 #include "coder.hpp"
+#include "gil.hpp"
 #include "resolve_field_name.hpp"
+#include "resolve_trace_name.hpp"
 
 namespace kodo_python
 {
     template<class Encoder>
-    void set_const_symbols(Encoder& encoder, const std::string& data)
+    void set_const_symbols(Encoder& encoder, boost::python::object data)
     {
-        auto storage = sak::const_storage(
-            (uint8_t*)data.c_str(), (uint32_t)data.length());
+        buffer symbols(data);
+        auto storage = sak::const_storage(symbols.data(), symbols.size());
+
+        release_gil nogil;
         encoder.set_const_symbols(storage);
     }
 
     template<class Encoder>
-    void set_const_symbol(Encoder& encoder, uint32_t index, const std::string& data)
+    void set_const_symbol(Encoder& encoder, uint32_t index,
+                          boost::python::object data)
     {
-        auto storage = sak::const_storage(
-            (uint8_t*)data.c_str(), (uint32_t)data.length());
+        buffer symbol(data);
+        auto storage = sak::const_storage(symbol.data(), symbol.size());
+
+        release_gil nogil;
         encoder.set_const_symbol(index, storage);
     }
 
@@ -40,7 +48,11 @@ namespace kodo_python
     PyObject* encoder_write_payload(Encoder& encoder)
     {
         std::vector<uint8_t> payload(encoder.payload_size());
-        uint32_t length = encoder.write_payload(payload.data());
+        uint32_t length = 0;
+        {
+            release_gil nogil;
+            length = write_payload(encoder, payload.data());
+        }
         #if PY_MAJOR_VERSION >= 3
         return PyBytes_FromStringAndSize((char*)payload.data(), length);
         #else
@@ -48,6 +60,79 @@ namespace kodo_python
         #endif
     }
 
+    template<class Encoder>
+    uint32_t encoder_write_payload_into(
+        Encoder& encoder, boost::python::object data, uint32_t offset)
+    {
+        buffer payload(data, PyBUF_WRITABLE);
+        check_buffer_size(payload, offset, encoder.payload_size());
+
+        release_gil nogil;
+        return write_payload(encoder, payload.data() + offset);
+    }
+
+    template<class Encoder>
+    std::vector<uint32_t> write_payloads(
+        Encoder& encoder, uint8_t* data, uint32_t count)
+    {
+        std::vector<uint32_t> lengths(count);
+
+        release_gil nogil;
+        for (uint32_t i = 0; i < count; ++i)
+        {
+            lengths[i] = write_payload(encoder, data);
+            data += lengths[i];
+        }
+        return lengths;
+    }
+
+    template<class Encoder>
+    boost::python::list encoder_write_payloads_into(
+        Encoder& encoder, boost::python::object data, uint32_t count,
+        uint32_t offset)
+    {
+        buffer payloads(data, PyBUF_WRITABLE);
+        check_buffer_size(
+            payloads, offset, (uint64_t)count * encoder.payload_size());
+
+        auto lengths = write_payloads(encoder, payloads.data() + offset, count);
+
+        boost::python::list result;
+        for (auto length : lengths)
+        {
+            result.append(length);
+        }
+        return result;
+    }
+
+    template<class Encoder>
+    boost::python::tuple encoder_write_payloads(
+        Encoder& encoder, uint32_t count)
+    {
+        using namespace boost::python;
+
+        object payloads(handle<>(PyByteArray_FromStringAndSize(
+            NULL, (Py_ssize_t)count * encoder.payload_size())));
+
+        auto lengths = write_payloads(
+            encoder, (uint8_t*)PyByteArray_AS_STRING(payloads.ptr()), count);
+
+        // Shrink the buffer to the bytes actually written
+        Py_ssize_t total = 0;
+        list result;
+        for (auto length : lengths)
+        {
+            total += length;
+            result.append(length);
+        }
+        if (PyByteArray_Resize(payloads.ptr(), total) != 0)
+        {
+            throw_error_already_set();
+        }
+
+        return make_tuple(payloads, result);
+    }
+
     template<bool IsSystematicEncoder>
     struct systematic_encoder_methods
     {
@@ -103,25 +188,62 @@ namespace kodo_python
     {
         using boost::python::arg;
         using boost::python::args;
-        using encoder_type = Coder<Field, TraceTag>;
+        using encoder_type = counted_coder<Coder<Field, TraceTag>>;
 
         std::string field = resolve_field_name<Field>();
         std::string kind = "Encoder";
-        std::string name = stack + kind + field;
+        std::string trace = resolve_trace_name<TraceTag>();
+        std::string name = stack + kind + field + trace;
 
         auto encoder_class = coder<Coder, Field, TraceTag>(name)
         .def("write_payload", &encoder_write_payload<encoder_type>,
             "Encode a symbol.\n\n"
             "\t:returns: The encoded symbol.\n"
         )
+        .def("write_payload_into", &encoder_write_payload_into<encoder_type>,
+            (arg("buffer"), arg("offset") = 0),
+            "Encode a symbol into a writable buffer.\n\n"
+            "The buffer must be able to hold payload_size() bytes starting "
+            "at the given offset.\n\n"
+            "\t:param buffer: The writable buffer, e.g. a bytearray.\n"
+            "\t:param offset: The offset in bytes where the payload is "
+            "written.\n"
+            "\t:returns: The number of bytes written.\n"
+        )
+        .def("write_payloads", &encoder_write_payloads<encoder_type>,
+            arg("count"),
+            "Encode a number of symbols in a single call.\n\n"
+            "The payloads are packed back to back in one contiguous buffer, "
+            "i.e. payload i starts where payload i - 1 ends.\n\n"
+            "\t:param count: The number of payloads to write.\n"
+            "\t:returns: A tuple containing a bytearray with the payloads "
+            "and a list with the length of each payload.\n"
+        )
+        .def("write_payloads_into",
+            &encoder_write_payloads_into<encoder_type>,
+            (arg("buffer"), arg("count"), arg("offset") = 0),
+            "Encode a number of symbols into a writable buffer in a single "
+            "call.\n\n"
+            "The payloads are packed back to back starting at the given "
+            "offset. The buffer must be able to hold count * payload_size() "
+            "bytes starting at the offset.\n\n"
+            "\t:param buffer: The writable buffer, e.g. a bytearray.\n"
+            "\t:param count: The number of payloads to write.\n"
+            "\t:param offset: The offset in bytes where the first payload is "
+            "written.\n"
+            "\t:returns: A list with the length of each payload.\n"
+        )
         .def("set_const_symbols", &set_const_symbols<encoder_type>,
             arg("symbols"),
             "Set the symbols to be encoded.\n\n"
+            "The symbols can be any object supporting the buffer protocol, "
+            "e.g. bytes, bytearray, memoryview, mmap or a numpy array.\n\n"
             "\t:param symbols: The symbols to be encoded.\n"
         )
         .def("set_const_symbol", &set_const_symbol<encoder_type>,
             args("index", "symbol"),
             "Set a symbol to be encoded.\n\n"
+            "The symbol can be any object supporting the buffer protocol.\n\n"
             "\t:param index: The index of the symbol in the coding block.\n"
             "\t:param symbol: The actual data of that symbol.\n");
 
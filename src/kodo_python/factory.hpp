@@ -11,7 +11,9 @@
 #include <boost/python/args.hpp>
 
 #include <kodo_core/has_is_complete.hpp>
+#include "counted_coder.hpp"
 #include "resolve_field_name.hpp"
+#include "resolve_trace_name.hpp"
 
 namespace kodo_python
 {
@@ -25,6 +27,20 @@ namespace kodo_python
         }
     };
 
+    template<class Factory, class Coder>
+    void recycle(Factory& factory, Coder& coder)
+    {
+        if (!coder.has_limits_of(factory))
+        {
+            PyErr_SetString(PyExc_ValueError,
+                "The coder was built with other maximum symbols or symbol "
+                "size than the factory.");
+            boost::python::throw_error_already_set();
+        }
+
+        coder.initialize(factory);
+    }
+
     template<
         template<class, class> class Coder,
         class Field, class TraceTag
@@ -35,14 +51,15 @@ namespace kodo_python
         using boost::python::args;
         using boost::python::class_;
         using boost::python::init;
-        using stack_type = Coder<Field, TraceTag>;
+        using stack_type = counted_coder<Coder<Field, TraceTag>>;
         using factory_type = typename stack_type::factory;
 
         std::string field = resolve_field_name<Field>();
         std::string coder =
             kodo_core::has_is_complete<stack_type>::value ? "Decoder" : "Encoder";
         std::string kind = coder + std::string("Factory");
-        std::string name = stack + kind + field;
+        std::string trace = resolve_trace_name<TraceTag>();
+        std::string name = stack + kind + field + trace;
 
         auto factory_class = class_<factory_type, boost::noncopyable>(
             name.c_str(),
@@ -57,6 +74,16 @@ namespace kodo_python
         .def("build", &factory_type::build,
             "Build the actual coder.\n\n"
             "\t:returns: An instantiation of a coder.\n")
+        .def("recycle", &recycle<factory_type, stack_type>, arg("coder"),
+            "Reset a coder so that it can be reused.\n\n"
+            "The coder is initialized with the current settings of the "
+            "factory, e.g. the number of symbols, as if it had been returned "
+            "by build(). This reuses the memory of the coder instead of "
+            "allocating a new one. The coder must have been built by a "
+            "factory of the same stack with the same max_symbols and "
+            "max_symbol_size, since its memory is allocated for these "
+            "limits. Otherwise a ValueError is raised.\n\n"
+            "\t:param coder: The coder to reset.\n")
         .def("set_symbols", &factory_type::set_symbols, arg("symbols"),
             "Set the number of symbols.\n\n"
             "\t:param symbols: The number of symbols.\n"
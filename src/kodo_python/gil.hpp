@@ -0,0 +1,55 @@
+// Copyright Steinwurf ApS 2015.
+// Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+// See accompanying file LICENSE.rst or
+// http://www.steinwurf.com/licensing
+
+#pragma once
+
+#include <Python.h>
+#include <boost/noncopyable.hpp>
+
+namespace kodo_python
+{
+    /// Releases the global interpreter lock (GIL) for the lifetime of the
+    /// object, so that other Python threads can run while a coder performs
+    /// the finite field computations. No Python objects may be accessed
+    /// while the GIL is released.
+    class release_gil : boost::noncopyable
+    {
+    public:
+
+        release_gil() :
+            m_state(PyEval_SaveThread())
+        { }
+
+        ~release_gil()
+        {
+            PyEval_RestoreThread(m_state);
+        }
+
+    private:
+
+        PyThreadState* m_state;
+    };
+
+    /// Acquires the GIL for the lifetime of the object. This is needed when
+    /// calling back into Python from code that may run while the GIL is
+    /// released, e.g. the trace callbacks.
+    class acquire_gil : boost::noncopyable
+    {
+    public:
+
+        acquire_gil() :
+            m_state(PyGILState_Ensure())
+        { }
+
+        ~acquire_gil()
+        {
+            PyGILState_Release(m_state);
+        }
+
+    private:
+
+        PyGILState_STATE m_state;
+    };
+}
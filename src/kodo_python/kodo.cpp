@@ -104,6 +104,12 @@ namespace kodo_python
 
     BOOST_PYTHON_MODULE(kodo)
     {
+        // The coders release the GIL during the coding operations, which
+        // requires that the GIL is initialized on older Python versions
+        #if PY_VERSION_HEX < 0x03070000
+        PyEval_InitThreads();
+        #endif
+
         boost::python::docstring_options doc_options;
         doc_options.disable_signatures();
         create_version_function();
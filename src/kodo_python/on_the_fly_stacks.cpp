@@ -12,6 +12,16 @@
 
 namespace kodo_python
 {
+    template<>
+    struct extra_decoder_methods<kodo_rlnc::on_the_fly_decoder>
+    {
+        template<class DecoderClass>
+        extra_decoder_methods(DecoderClass& decoder_class)
+        {
+            (take_decoded_method(decoder_class));
+        }
+    };
+
     void create_on_the_fly_stacks()
     {
         using namespace kodo_rlnc;
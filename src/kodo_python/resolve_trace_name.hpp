@@ -0,0 +1,34 @@
+// Copyright Steinwurf ApS 2016.
+// Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+// See accompanying file LICENSE.rst or
+// http://www.steinwurf.com/licensing
+
+#pragma once
+
+#include <string>
+#include <type_traits>
+
+#include <kodo_core/enable_trace.hpp>
+
+namespace kodo_python
+{
+    /// The features of the stacks with tracing
+    using trace_enabled = meta::typelist<kodo_core::enable_trace>;
+
+    /// The features of the stacks without tracing, which leaves the tracing
+    /// out of the coding loops altogether
+    using trace_disabled = meta::typelist<>;
+
+    template<class TraceTag>
+    std::string resolve_trace_name()
+    {
+        if (std::is_same<TraceTag, trace_disabled>::value)
+        {
+            return "NoTrace";
+        }
+        else
+        {
+            return "";
+        }
+    }
+}
@@ -26,13 +26,12 @@ namespace kodo_python
     };
 
     template<class Encoder>
-    void read_feedback(Encoder& encoder, const std::string& feedback)
+    void read_feedback(Encoder& encoder, boost::python::object feedback)
     {
-        std::vector<uint8_t> _feedback(feedback.length());
-        std::copy(
-            feedback.c_str(),
-            feedback.c_str() + feedback.length(),
-            _feedback.data());
+        buffer data(feedback);
+        std::vector<uint8_t> _feedback(data.data(), data.data() + data.size());
+
+        release_gil nogil;
         encoder.read_feedback(_feedback.data());
     }
 
@@ -54,7 +53,11 @@ namespace kodo_python
     PyObject* write_feedback(Decoder& decoder)
     {
         std::vector<uint8_t> payload(decoder.feedback_size());
-        uint32_t length = decoder.write_feedback(payload.data());
+        uint32_t length = 0;
+        {
+            release_gil nogil;
+            length = decoder.write_feedback(payload.data());
+        }
         #if PY_MAJOR_VERSION >= 3
         return PyBytes_FromStringAndSize((char*)payload.data(), length);
         #else
@@ -69,6 +72,7 @@ namespace kodo_python
         extra_decoder_methods(DecoderClass& decoder_class)
         {
             (sliding_window_coder_methods(decoder_class));
+            (take_decoded_method(decoder_class));
             decoder_class
             .def("write_feedback",
                 &write_feedback<typename DecoderClass::wrapped_type>,
@@ -0,0 +1,102 @@
+// Copyright Steinwurf ApS 2016.
+// Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+// See accompanying file LICENSE.rst or
+// http://www.steinwurf.com/licensing
+
+#pragma once
+
+#include <cstdint>
+#include <memory>
+
+#include <Python.h>
+#include <boost/python.hpp>
+
+namespace kodo_python
+{
+    /// A Python object which exports a read-only range of the memory of a
+    /// coder through the buffer protocol. It keeps a reference to the
+    /// Python object of the coder and to the storage held by the coder, so
+    /// that the memory stays valid as long as a memoryview of it exists.
+    struct storage_view
+    {
+        PyObject_HEAD
+        PyObject* owner;
+        std::shared_ptr<void>* storage;
+        const uint8_t* data;
+        Py_ssize_t size;
+    };
+
+    inline int storage_view_getbuffer(
+        PyObject* self, Py_buffer* view, int flags)
+    {
+        auto exporter = (storage_view*)self;
+        return PyBuffer_FillInfo(view, self, (void*)exporter->data,
+                                 exporter->size, 1, flags);
+    }
+
+    inline void storage_view_dealloc(PyObject* self)
+    {
+        auto exporter = (storage_view*)self;
+        Py_XDECREF(exporter->owner);
+        delete exporter->storage;
+        Py_TYPE(self)->tp_free(self);
+    }
+
+    inline PyTypeObject* storage_view_type()
+    {
+        static PyBufferProcs buffer_procs;
+        static PyTypeObject type = { PyVarObject_HEAD_INIT(NULL, 0) };
+
+        if (type.tp_name == nullptr)
+        {
+            buffer_procs.bf_getbuffer = storage_view_getbuffer;
+
+            type.tp_name = "kodo.StorageView";
+            type.tp_doc = "Read-only memory of a coder.";
+            type.tp_basicsize = sizeof(storage_view);
+            type.tp_dealloc = storage_view_dealloc;
+            type.tp_as_buffer = &buffer_procs;
+            #if PY_MAJOR_VERSION >= 3
+            type.tp_flags = Py_TPFLAGS_DEFAULT;
+            #else
+            type.tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_NEWBUFFER;
+            #endif
+
+            if (PyType_Ready(&type) != 0)
+            {
+                type.tp_name = nullptr;
+                boost::python::throw_error_already_set();
+            }
+        }
+        return &type;
+    }
+
+    /// Return a read-only memoryview of the given memory, which is kept
+    /// valid by the owner and the storage.
+    inline PyObject* make_storage_view(
+        PyObject* owner, const std::shared_ptr<void>& storage,
+        const uint8_t* data, uint32_t size)
+    {
+        PyTypeObject* type = storage_view_type();
+        auto exporter = (storage_view*)type->tp_alloc(type, 0);
+        if (exporter == nullptr)
+        {
+            boost::python::throw_error_already_set();
+        }
+
+        Py_INCREF(owner);
+        exporter->owner = owner;
+        exporter->storage = new std::shared_ptr<void>(storage);
+        exporter->data = data;
+        exporter->size = size;
+
+        // The memoryview holds the only reference to the exporter
+        PyObject* view = PyMemoryView_FromObject((PyObject*)exporter);
+        Py_DECREF(exporter);
+        if (view == nullptr)
+        {
+            boost::python::throw_error_already_set();
+        }
+        return view;
+    }
+}
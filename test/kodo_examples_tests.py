@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+# Copyright Steinwurf ApS 2016.
+# Distributed under the "STEINWURF RESEARCH LICENSE 1.0".
+# See accompanying file LICENSE.rst or
+# http://www.steinwurf.com/licensing
+
+import math
+import os
+import random
+import sys
+import unittest
+
+import kodo
+
+# The helper modules are in the examples folder
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'examples'))
+
+import kodo_pacing
+import kodo_redundancy
+import kodo_stream
+
+
+class Clock(object):
+
+    """A clock which only advances when told to."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class TestRedundancyController(unittest.TestCase):
+
+    def test_report(self):
+        controller = kodo_redundancy.RedundancyController(
+            loss=0.1, smoothing=0.25)
+
+        # Half of the payloads are lost
+        controller.report(10, 5)
+        self.assertAlmostEqual(controller.loss, 0.2)
+        self.assertEqual(controller.reports, 1)
+
+        # No payloads are lost
+        controller.report(10, 10)
+        self.assertAlmostEqual(controller.loss, 0.15)
+        self.assertEqual(controller.reports, 2)
+
+        # Reports without any payloads sent are ignored
+        controller.report(0, 0)
+        self.assertAlmostEqual(controller.loss, 0.15)
+        self.assertEqual(controller.reports, 2)
+
+    def test_loss_bounds(self):
+        controller = kodo_redundancy.RedundancyController(
+            loss=0.5, smoothing=1.0, max_loss=0.8)
+
+        controller.report(10, 0)
+        self.assertAlmostEqual(controller.loss, 0.8)
+
+        # Duplicates may make the receiver count more than was sent
+        controller.report(10, 12)
+        self.assertAlmostEqual(controller.loss, 0.0)
+
+    def test_payloads(self):
+        controller = kodo_redundancy.RedundancyController(
+            loss=0.0, overhead=1)
+
+        # Without loss only the overhead is added
+        self.assertEqual(controller.payloads(0), 0)
+        self.assertEqual(controller.payloads(-1), 0)
+        self.assertEqual(controller.payloads(10), 11)
+        self.assertAlmostEqual(controller.redundancy(10), 10.0)
+
+        controller.loss = 0.2
+        missing = 32
+        count = controller.payloads(missing)
+
+        # The count is the smallest one which covers the missing symbols
+        # with the requested confidence
+        def covered(n):
+            p = controller.loss
+            expected = (1.0 - p) * n
+            deviation = math.sqrt(n * p * (1.0 - p))
+            return expected - controller.confidence * deviation >= \
+                missing + controller.overhead - 1e-9
+
+        self.assertTrue(covered(count))
+        self.assertFalse(covered(count - 1))
+
+    def test_payloads_follow_loss(self):
+        controller = kodo_redundancy.RedundancyController(
+            loss=0.0, smoothing=0.5)
+
+        counts = [controller.payloads(16)]
+        for i in range(5):
+            controller.report(16, 8)
+            counts.append(controller.payloads(16))
+        self.assertEqual(counts, sorted(counts))
+        self.assertGreater(counts[-1], counts[0])
+
+        for i in range(5):
+            controller.report(16, 16)
+            counts.append(controller.payloads(16))
+        self.assertLess(counts[-1], counts[5])
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_invalid_rate(self):
+        self.assertRaises(ValueError, kodo_pacing.TokenBucket, 0, 100)
+        self.assertRaises(ValueError, kodo_pacing.TokenBucket, -1, 100)
+
+    def test_consume(self):
+        clock = Clock()
+        # 1000 bytes per second
+        bucket = kodo_pacing.TokenBucket(8000, 100, clock=clock)
+        self.assertEqual(bucket.tokens(), 100)
+
+        # The burst is sent right away
+        self.assertEqual(bucket.consume(100), 0.0)
+        self.assertEqual(bucket.tokens(), 0)
+
+        # Then the sender must wait for the tokens of the packet
+        self.assertAlmostEqual(bucket.consume(50), 0.05)
+        self.assertAlmostEqual(bucket.tokens(), -50)
+
+        clock.advance(0.05)
+        self.assertAlmostEqual(bucket.tokens(), 0)
+        clock.advance(0.02)
+        self.assertAlmostEqual(bucket.tokens(), 20)
+        self.assertAlmostEqual(bucket.consume(20), 0.0)
+
+    def test_burst_bound(self):
+        clock = Clock()
+        bucket = kodo_pacing.TokenBucket(8000, 100, clock=clock)
+        bucket.consume(60)
+
+        # The tokens do not exceed the burst after an idle period
+        clock.advance(10.0)
+        self.assertEqual(bucket.tokens(), 100)
+        self.assertEqual(bucket.consume(100), 0.0)
+        self.assertAlmostEqual(bucket.consume(1), 0.001)
+
+    def test_wait(self):
+        clock = Clock()
+        bucket = kodo_pacing.TokenBucket(
+            8000, 100, min_sleep=1.0, clock=clock)
+
+        # Delays below min_sleep are returned without sleeping
+        self.assertEqual(bucket.wait(100), 0.0)
+        self.assertAlmostEqual(bucket.wait(10), 0.01)
+        self.assertAlmostEqual(bucket.wait(10), 0.02)
+
+
+class TestStream(unittest.TestCase):
+
+    def test_in_order_symbols(self):
+        encoder = kodo.OnTheFlyEncoderFactoryBinary8(8, 160).build()
+        decoder = kodo.OnTheFlyDecoderFactoryBinary8(8, 160).build()
+        data_in = os.urandom(encoder.block_size())
+        encoder.set_const_symbols(data_in)
+
+        # The systematic payloads carry one symbol each, so shuffling them
+        # decodes the symbols out of order. A duplicate is thrown in.
+        payloads = [encoder.write_payload() for i in range(8)]
+        random.Random(3).shuffle(payloads)
+        payloads.insert(4, payloads[2])
+
+        read = []
+
+        def received():
+            for payload in payloads:
+                read.append(payload)
+                yield payload
+
+        symbols = []
+        for index, symbol in kodo_stream.in_order_symbols(
+                decoder, received()):
+            self.assertTrue(decoder.is_symbol_uncoded(index))
+            symbols.append((index, bytes(symbol), len(read)))
+
+        self.assertEqual(
+            [index for index, symbol, count in symbols], list(range(8)))
+        for index, symbol, count in symbols:
+            self.assertEqual(symbol, data_in[index * 160:(index + 1) * 160])
+        self.assertTrue(decoder.is_complete())
+
+        # The symbols before the last payload are not held back
+        self.assertLess(symbols[0][2], len(payloads))
+
+
+def main():
+    unittest.main()
+
+if __name__ == "__main__":
+    main()
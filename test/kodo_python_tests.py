@@ -7,6 +7,7 @@
 # http://www.steinwurf.com/licensing
 
 import os
+import threading
 import unittest
 
 import kodo
@@ -93,6 +94,12 @@ class TestEncodeDecode(unittest.TestCase):
         for test_set in test_sets:
             self.encode_decode_simple(*test_set)
 
+    def test_all_without_trace(self):
+        for test_set in test_sets:
+            self.encode_decode_simple(*[
+                getattr(kodo, factory.__name__ + 'NoTrace')
+                for factory in test_set])
+
     def encode_decode_simple(self, EncoderFactory, DecoderFactory):
         # Set the number of symbols (i.e. the generation size in RLNC
         # terminology) and the size of a symbol in bytes
@@ -131,6 +138,500 @@ class TestEncodeDecode(unittest.TestCase):
         self.assertEqual(data_out, data_in)
 
 
+class TestBufferProtocol(unittest.TestCase):
+
+    def test_buffer_types(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            data_in = os.urandom(encoder.block_size())
+
+            # The encoder reads the symbols directly from any buffer object
+            encoder.set_const_symbols(memoryview(bytearray(data_in)))
+
+            buffer_types = [bytes, bytearray, memoryview]
+            packets = 0
+            while not decoder.is_complete():
+                packet = encoder.write_payload()
+                decoder.read_payload(buffer_types[packets % 3](packet))
+                packets += 1
+
+            self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+    def test_read_only_payload_is_not_modified(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            encoder.set_const_symbols(os.urandom(encoder.block_size()))
+
+            packet = encoder.write_payload()
+            original = bytes(bytearray(packet))
+            decoder.read_payload(packet)
+            self.assertEqual(packet, original)
+
+    def test_writable_payload(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+
+            # A writable payload is only decoded in place on request
+            packet = bytearray(encoder.write_payload())
+            original = bytes(packet)
+            decoder.read_payload(packet)
+            self.assertEqual(packet, original)
+
+            if hasattr(encoder, 'write_payloads') and \
+                    hasattr(decoder, 'read_payloads'):
+                payloads, lengths = encoder.write_payloads(
+                    10 * encoder.symbols())
+                original = bytes(payloads)
+                decoder.read_payloads(payloads, lengths)
+                self.assertEqual(payloads, original)
+                self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+            decoder = DecoderFactory(8, 160).build()
+            while not decoder.is_complete():
+                decoder.read_payload(
+                    bytearray(encoder.write_payload()), inplace=True)
+            self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+    def test_write_payload_into(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            if not hasattr(encoder, 'write_payload_into'):
+                continue
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+
+            offset = 10
+            payload = bytearray(offset + encoder.payload_size())
+            while not decoder.is_complete():
+                length = encoder.write_payload_into(payload, offset)
+                self.assertLessEqual(length, encoder.payload_size())
+                decoder.read_payload(bytes(payload[offset:offset + length]))
+
+            self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+            # The recoders write into the same kind of buffer
+            if hasattr(decoder, 'write_payload_into'):
+                payload = bytearray(decoder.payload_size())
+                length = decoder.write_payload_into(payload)
+                self.assertLessEqual(length, decoder.payload_size())
+
+            payload = bytearray(offset + encoder.payload_size())
+            self.assertRaises(
+                ValueError, encoder.write_payload_into, payload, offset + 1)
+
+    def test_write_payloads(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            if not hasattr(encoder, 'write_payloads'):
+                continue
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+
+            count = 10 * encoder.symbols()
+            payloads, lengths = encoder.write_payloads(count)
+            self.assertEqual(len(lengths), count)
+            self.assertEqual(len(payloads), sum(lengths))
+
+            offset = 0
+            for length in lengths:
+                if decoder.is_complete():
+                    break
+                decoder.read_payload(bytes(payloads[offset:offset + length]))
+                offset += length
+
+            self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+            payloads = bytearray(4 * encoder.payload_size())
+            lengths = encoder.write_payloads_into(payloads, 4)
+            self.assertEqual(len(lengths), 4)
+            self.assertRaises(
+                ValueError, encoder.write_payloads_into, payloads, 5)
+
+    def test_read_payloads(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            if not hasattr(encoder, 'write_payloads') or \
+                    not hasattr(decoder, 'read_payloads'):
+                continue
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+
+            count = 10 * encoder.symbols()
+            payloads, lengths = encoder.write_payloads(count)
+
+            # Packed payloads, decoding stops when the decoder is complete
+            consumed = decoder.read_payloads(bytes(payloads), lengths)
+            self.assertTrue(decoder.is_complete())
+            self.assertLessEqual(consumed, count)
+            self.assertEqual(decoder.rank(), decoder.symbols())
+            self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+            # An iterable of separate payloads
+            decoder = DecoderFactory(8, 160).build()
+            packets = [encoder.write_payload() for i in range(count)]
+            consumed = decoder.read_payloads(packets)
+            self.assertTrue(decoder.is_complete())
+            self.assertLessEqual(consumed, count)
+            self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+            self.assertRaises(
+                ValueError, decoder.read_payloads, payloads,
+                [len(payloads) + 1])
+
+    def test_copy_from_symbols_into(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            if not hasattr(decoder, 'copy_from_symbols_into'):
+                continue
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+
+            while not decoder.is_complete():
+                decoder.read_payload(encoder.write_payload())
+
+            data_out = bytearray(decoder.block_size() + 10)
+            length = decoder.copy_from_symbols_into(data_out, 10)
+            self.assertEqual(length, decoder.block_size())
+            self.assertEqual(data_out[10:], data_in)
+
+            # Only the part of the block that fits is copied
+            data_out = bytearray(300)
+            self.assertEqual(decoder.copy_from_symbols_into(data_out), 300)
+            self.assertEqual(data_out, data_in[:300])
+
+            symbol = bytearray(decoder.symbol_size())
+            decoder.copy_from_symbol_into(1, symbol)
+            self.assertEqual(symbol, data_in[160:320])
+
+            self.assertRaises(
+                ValueError, decoder.copy_from_symbol_into, 1, symbol, 1)
+
+    def test_set_mutable_symbols(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder_factory = DecoderFactory(8, 160)
+            decoder = decoder_factory.build()
+            if not hasattr(decoder, 'set_mutable_symbols'):
+                continue
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+
+            data_out = bytearray(decoder.block_size())
+            decoder.set_mutable_symbols(data_out)
+
+            # The buffer is exported while the decoder uses it
+            self.assertRaises(BufferError, data_out.extend, b'x')
+
+            while not decoder.is_complete():
+                decoder.read_payload(encoder.write_payload())
+
+            self.assertEqual(data_out, data_in)
+            self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+            # Recycling the decoder releases the buffer
+            decoder_factory.recycle(decoder)
+            data_out.extend(b'x')
+
+            self.assertRaises(
+                ValueError, decoder.set_mutable_symbols,
+                bytearray(decoder.block_size() - 1))
+            self.assertRaises(
+                BufferError, decoder.set_mutable_symbols, data_in)
+
+    def test_symbols_view(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            if not hasattr(decoder, 'symbols_view'):
+                continue
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+
+            view = decoder.symbols_view()
+            symbol = decoder.symbol_view(1)
+            self.assertTrue(view.readonly)
+            self.assertEqual(len(view), decoder.block_size())
+            self.assertEqual(len(symbol), decoder.symbol_size())
+
+            while not decoder.is_complete():
+                decoder.read_payload(encoder.write_payload())
+
+            # The views follow the decoding and keep the decoder alive
+            del decoder
+            self.assertEqual(view.tobytes(), data_in)
+            self.assertEqual(symbol.tobytes(), data_in[160:320])
+
+            def write(view):
+                view[0] = 0
+            self.assertRaises(TypeError, write, view)
+
+            decoder = DecoderFactory(8, 160).build()
+            self.assertRaises(IndexError, decoder.symbol_view, 8)
+
+    def test_invalid_buffer(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            decoder = DecoderFactory(8, 160).build()
+            self.assertRaises(TypeError, decoder.read_payload, 42)
+
+
+class TestRecycle(unittest.TestCase):
+
+    def test_recycle(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder_factory = EncoderFactory(8, 160)
+            decoder_factory = DecoderFactory(8, 160)
+            encoder = encoder_factory.build()
+            decoder = decoder_factory.build()
+
+            for symbols in [8, 4, 8]:
+                # Reuse the same coders with a different number of symbols
+                encoder_factory.set_symbols(symbols)
+                decoder_factory.set_symbols(symbols)
+                encoder_factory.recycle(encoder)
+                decoder_factory.recycle(decoder)
+                self.assertEqual(decoder.symbols(), symbols)
+                self.assertEqual(decoder.rank(), 0)
+
+                data_in = os.urandom(encoder.block_size())
+                encoder.set_const_symbols(data_in)
+                while not decoder.is_complete():
+                    decoder.read_payload(encoder.write_payload())
+
+                self.assertEqual(decoder.copy_from_symbols(), data_in)
+
+            # Coders of another stack cannot be recycled
+            self.assertRaises(TypeError, decoder_factory.recycle, encoder)
+
+            # Nor coders built for smaller limits, whose memory is too small
+            small_decoder = DecoderFactory(4, 160).build()
+            self.assertRaises(
+                ValueError, decoder_factory.recycle, small_decoder)
+            small_decoder = DecoderFactory(8, 80).build()
+            self.assertRaises(
+                ValueError, decoder_factory.recycle, small_decoder)
+
+
+class TestStats(unittest.TestCase):
+
+    def test_stats(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder_factory = EncoderFactory(8, 160)
+            decoder_factory = DecoderFactory(8, 160)
+            encoder = encoder_factory.build()
+            decoder = decoder_factory.build()
+
+            stats = decoder.stats()
+            self.assertEqual(stats['payloads_read'], 0)
+            self.assertEqual(stats['elimination_time'], 0)
+
+            encoder.set_const_symbols(os.urandom(encoder.block_size()))
+            payloads = []
+            while not decoder.is_complete():
+                payload = encoder.write_payload()
+                payloads.append(payload)
+                decoder.read_payload(payload)
+
+            # A payload which was already received is not innovative
+            decoder.read_payload(payloads[0])
+
+            size = sum(len(payload) for payload in payloads)
+            stats = encoder.stats()
+            self.assertEqual(stats['payloads_written'], len(payloads))
+            self.assertEqual(stats['bytes_written'], size)
+            self.assertEqual(stats['payloads_read'], 0)
+
+            stats = decoder.stats()
+            self.assertEqual(stats['payloads_read'], len(payloads) + 1)
+            self.assertEqual(stats['bytes_read'], size + len(payloads[0]))
+            self.assertEqual(
+                stats['non_innovative'],
+                len(payloads) + 1 - decoder.symbols())
+            self.assertGreater(stats['elimination_time'], 0)
+
+            decoder.reset_stats()
+            self.assertEqual(decoder.stats()['payloads_read'], 0)
+
+            # Recycling a coder clears its counters
+            encoder_factory.recycle(encoder)
+            self.assertEqual(encoder.stats()['payloads_written'], 0)
+
+
+class TestTakeDecoded(unittest.TestCase):
+
+    def test_take_decoded(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder_factory = DecoderFactory(8, 160)
+            decoder = decoder_factory.build()
+            if not hasattr(decoder, 'take_decoded'):
+                continue
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+            self.assertEqual(decoder.take_decoded(), [])
+
+            # Every symbol is taken exactly once
+            taken = []
+            while not decoder.is_complete():
+                decoder.read_payload(encoder.write_payload())
+                taken.extend(decoder.take_decoded())
+            taken.extend(decoder.take_decoded())
+            self.assertEqual(sorted(taken), list(range(decoder.symbols())))
+            self.assertEqual(decoder.take_decoded(), [])
+
+            for index in taken:
+                self.assertEqual(
+                    decoder.copy_from_symbol(index),
+                    data_in[index * 160:(index + 1) * 160])
+
+            decoder_factory.recycle(decoder)
+            self.assertEqual(decoder.take_decoded(), [])
+
+
+class TestSymbolStates(unittest.TestCase):
+
+    def test_symbol_states(self):
+        for EncoderFactory, DecoderFactory in test_sets:
+            encoder = EncoderFactory(8, 160).build()
+            decoder = DecoderFactory(8, 160).build()
+            if hasattr(encoder, 'symbol_pivots'):
+                self.assertEqual(encoder.symbol_pivots(), bytes(bytearray(8)))
+                encoder.set_const_symbols(os.urandom(encoder.block_size()))
+                self.assertEqual(
+                    encoder.symbol_pivots(), bytes(bytearray([1] * 8)))
+            else:
+                encoder.set_const_symbols(os.urandom(encoder.block_size()))
+
+            if not hasattr(decoder, 'symbol_states'):
+                continue
+            self.assertEqual(decoder.symbol_states(), bytes(bytearray(8)))
+
+            for i in range(3):
+                decoder.read_payload(encoder.write_payload())
+
+            states = bytearray(decoder.symbol_states())
+            self.assertEqual(len(states), decoder.symbols())
+            for i in range(decoder.symbols()):
+                if decoder.is_symbol_uncoded(i):
+                    self.assertEqual(states[i], 2)
+                elif decoder.is_symbol_partially_decoded(i):
+                    self.assertEqual(states[i], 1)
+                else:
+                    self.assertEqual(states[i], 0)
+            self.assertEqual(states.count(0), decoder.symbols_missing())
+
+            if hasattr(decoder, 'symbol_pivots'):
+                pivots = bytearray(decoder.symbol_pivots())
+                for i in range(decoder.symbols()):
+                    self.assertEqual(
+                        pivots[i], int(decoder.is_symbol_pivot(i)))
+
+
+class TestTrace(unittest.TestCase):
+
+    def test_trace_zones(self):
+        encoder = kodo.FullVectorEncoderFactoryBinary8(8, 160).build()
+        decoder = kodo.FullVectorDecoderFactoryBinary8(8, 160).build()
+
+        zones = []
+        decoder.set_trace_callback(
+            lambda zone, message: zones.append(zone),
+            zones=["decoder_state"])
+
+        encoder.set_const_symbols(os.urandom(encoder.block_size()))
+        decoder.read_payload(encoder.write_payload())
+
+        self.assertGreater(len(zones), 0)
+        self.assertEqual(set(zones), set(["decoder_state"]))
+
+    def test_trace_single_zone(self):
+        encoder = kodo.FullVectorEncoderFactoryBinary8(8, 160).build()
+        decoder = kodo.FullVectorDecoderFactoryBinary8(8, 160).build()
+
+        # A string is a single zone and not a sequence of characters
+        zones = []
+        decoder.set_trace_callback(
+            lambda zone, message: zones.append(zone),
+            zones="decoder_state")
+
+        encoder.set_const_symbols(os.urandom(encoder.block_size()))
+        decoder.read_payload(encoder.write_payload())
+
+        self.assertGreater(len(zones), 0)
+        self.assertEqual(set(zones), set(["decoder_state"]))
+
+    def test_trace_events(self):
+        encoder = kodo.FullVectorEncoderFactoryBinary8(8, 160).build()
+        decoder = kodo.FullVectorDecoderFactoryBinary8(8, 160).build()
+
+        events = []
+        decoder.set_trace_events(
+            lambda zone, rows: events.append((zone, rows)),
+            zones=["decoder_state"])
+
+        encoder.set_const_symbols(os.urandom(encoder.block_size()))
+        decoder.read_payload(encoder.write_payload())
+
+        zone, rows = events[-1]
+        self.assertEqual(zone, "decoder_state")
+        self.assertEqual(len(rows), decoder.symbols())
+        for index, row in enumerate(rows):
+            # The symbol index and state followed by the coefficients
+            self.assertEqual(row[0], index)
+            self.assertTrue(isinstance(row[1], str))
+            self.assertEqual(len(row), decoder.symbols() + 2)
+
+    def test_no_trace(self):
+        encoder = kodo.FullVectorEncoderFactoryBinary8NoTrace(8, 160).build()
+        decoder = kodo.FullVectorDecoderFactoryBinary8NoTrace(8, 160).build()
+
+        # The stacks without tracing have no trace functions
+        for coder in [encoder, decoder]:
+            self.assertFalse(hasattr(coder, 'set_trace_callback'))
+            self.assertFalse(hasattr(coder, 'set_trace_events'))
+            self.assertFalse(hasattr(coder, 'set_trace_stdout'))
+
+
+class TestThreading(unittest.TestCase):
+
+    def test_coders_in_threads(self):
+        # The GIL is released during coding, so every thread must be able
+        # to run its own encoder and decoder concurrently.
+        results = []
+
+        def encode_decode():
+            encoder = kodo.FullVectorEncoderFactoryBinary16(32, 1024).build()
+            decoder = kodo.FullVectorDecoderFactoryBinary16(32, 1024).build()
+            data_in = os.urandom(encoder.block_size())
+            encoder.set_const_symbols(data_in)
+
+            traces = []
+            decoder.set_trace_callback(
+                lambda zone, message: traces.append(zone))
+
+            while not decoder.is_complete():
+                decoder.read_payload(encoder.write_payload())
+
+            results.append(
+                decoder.copy_from_symbols() == data_in and len(traces) > 0)
+
+        threads = [threading.Thread(target=encode_decode) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [True] * len(threads))
+
+
 def main():
     unittest.main()
 